@@ -7,6 +7,8 @@ class CompanyAdmin(admin.ModelAdmin):
     list_display = ('name', 'cnpj', 'created_at')
     search_fields = ('name', 'cnpj')
     ordering = ('name',)
+    # Quem pode usar a empresa (X-Company-ID); usuários cadastrados sem um admin da empresa entram por aqui
+    filter_horizontal = ('members',)
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
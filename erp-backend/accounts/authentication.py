@@ -0,0 +1,18 @@
+from rest_framework.exceptions import PermissionDenied
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from accounts.tenant import resolve_company, is_company_member
+
+
+class CompanyMemberJWTAuthentication(JWTAuthentication):
+    """JWT authentication that also refuses an X-Company-ID the user is not a member of."""
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+
+        user, token = result
+        cached = resolve_company(request)
+        if cached is not None and not is_company_member(user, cached):
+            raise PermissionDenied("Usuário sem acesso a esta empresa.")
+        return user, token
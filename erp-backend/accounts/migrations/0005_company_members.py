@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_existing_members(apps, schema_editor):
+    # Até aqui todo usuário via todas as empresas; mantém o acesso de quem já existe
+    Company = apps.get_model('accounts', 'Company')
+    User = apps.get_model('accounts', 'User')
+    Membership = Company.members.through
+    Membership.objects.bulk_create(
+        [Membership(company_id=company_id, user_id=user_id)
+         for company_id in Company.objects.values_list('id', flat=True)
+         for user_id in User.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_user_company'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='companies', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(add_existing_members, reverse_code=migrations.RunPython.noop),
+    ]
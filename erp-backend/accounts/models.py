@@ -1,5 +1,6 @@
 # yourapp/models.py
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -7,6 +8,8 @@ class Company(models.Model):
     name = models.CharField(max_length=255)
     cnpj = models.CharField(max_length=18, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Usuários que podem trabalhar nesta empresa (X-Company-ID)
+    members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="companies", blank=True)
 
     def __str__(self):
         return self.name
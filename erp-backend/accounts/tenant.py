@@ -0,0 +1,172 @@
+"""
+Company (tenant) scope of the current request.
+
+TenantMiddleware resolves the X-Company-ID of the request once (request.company, from an
+in-process cache) and puts it in a context variable. TenantManager, the default manager of
+the models that carry a `company`, filters on it: only the rows of that company. Rows
+without company (legacy data) are visible to none until assign_tenant_company assigns
+them. A request without (a valid) X-Company-ID sees no rows at all; only outside a
+request (shell, migrations, Celery) and in the admin is nothing filtered.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import Company
+
+_current_company_id = ContextVar("current_company_id", default=None)
+# Dentro de uma requisição a empresa é obrigatória: sem ela os TenantManager não devolvem nada
+_company_required = ContextVar("company_required", default=False)
+
+# Empresa + ids dos membros, o que a checagem de acesso precisa
+CachedCompany = namedtuple("CachedCompany", ["company", "member_ids"])
+
+
+def get_current_company_id():
+    return _current_company_id.get()
+
+
+def parse_company_id(value):
+    """The X-Company-ID header as an int, None when missing or malformed."""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def company_context(company_id, required=False):
+    """
+    Scopes the TenantManager querysets to `company_id` inside the block. With required=True
+    a None company_id scopes them to nothing instead of to every company.
+    """
+    token = _current_company_id.set(company_id)
+    required_token = _company_required.set(required)
+    try:
+        yield
+    finally:
+        _company_required.reset(required_token)
+        _current_company_id.reset(token)
+
+
+class CompanyCache:
+    """
+    Small LRU of CachedCompany entries with a TTL, per process.
+
+    Saving or deleting a Company (or changing its members) drops its entry here; other
+    processes see the change when their entry expires (COMPANY_CACHE_TTL seconds).
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, company_id):
+        """CachedCompany of the id, None when the company does not exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(company_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(company_id)
+                return entry[1]
+
+        value = self._load(company_id)
+        with self._lock:
+            self._entries[company_id] = (now + self.ttl, value)
+            self._entries.move_to_end(company_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, company_id=None):
+        with self._lock:
+            if company_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(company_id, None)
+
+    @staticmethod
+    def _load(company_id):
+        company = Company.objects.filter(pk=company_id).first()
+        if company is None:
+            return None
+        return CachedCompany(company, frozenset(company.members.values_list("id", flat=True)))
+
+
+company_cache = CompanyCache(
+    maxsize=getattr(settings, "COMPANY_CACHE_SIZE", 256),
+    ttl=getattr(settings, "COMPANY_CACHE_TTL", 60),
+)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def _invalidate_company(sender, instance, **kwargs):
+    company_cache.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=Company.members.through)
+def _invalidate_members(sender, instance, reverse, **kwargs):
+    # reverse: user.companies.add(...) — invalida tudo, é raro
+    company_cache.invalidate(None if reverse else instance.pk)
+
+
+def resolve_company(request):
+    """
+    CachedCompany of the request's X-Company-ID (None when missing or unknown).
+
+    Uses what TenantMiddleware already resolved; requests built without the middleware
+    go to the cache directly.
+    """
+    if hasattr(request, "tenant_company"):
+        return request.tenant_company
+    company_id = parse_company_id(request.headers.get("X-Company-ID"))
+    return company_cache.get(company_id) if company_id else None
+
+
+def is_company_member(user, cached):
+    return user.is_superuser or user.pk in cached.member_ids
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_company(self, company_id):
+        return self.filter(company_id=company_id)
+
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        company_id = get_current_company_id()
+        if company_id is None:
+            return queryset.none() if _company_required.get() else queryset
+        return queryset.for_company(company_id)
+
+
+class TenantMiddleware:
+    """
+    Resolves X-Company-ID once per request onto request.company and scopes every query of
+    the request to it; a request without it sees no tenant rows. The membership check runs
+    after authentication (accounts.authentication.CompanyMemberJWTAuthentication).
+
+    Paths in TENANT_EXEMPT_PATHS (the admin) keep the unfiltered managers.
+    """
+    exempt_paths = tuple(getattr(settings, "TENANT_EXEMPT_PATHS", ("/admin/",)))
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        company_id = parse_company_id(request.headers.get("X-Company-ID"))
+        request.tenant_company = company_cache.get(company_id) if company_id else None
+        request.company = request.tenant_company.company if request.tenant_company else None
+
+        required = not request.path.startswith(self.exempt_paths)
+        with company_context(company_id, required=required):
+            return self.get_response(request)
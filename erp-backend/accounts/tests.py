@@ -1,3 +1,64 @@
+from decimal import Decimal
 from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import Company, User
+from accounts.tenant import company_context
+from clients.models import Client
+from events.models import Event
+from payments.models import Bank
 
-# Create your tests here.
+
+class TenantScopeTests(TestCase):
+    """Requests only ever see the rows of their X-Company-ID; without it they see none."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u1", email="u1@example.com", cpf="1", password="p")
+        other = User.objects.create_user(username="u2", email="u2@example.com", cpf="2", password="p")
+        cls.company = Company.objects.create(name="C1")
+        cls.company.members.add(cls.user)
+        cls.other_company = Company.objects.create(name="C2")
+        cls.other_company.members.add(other)
+
+        for company, owner in ((cls.company, cls.user), (cls.other_company, other)):
+            Bank.all_objects.create(name=f"Banco {company.name}", balance=Decimal("0.00"), user=owner, company=company)
+            Client.all_objects.create(name=f"Cliente {company.name}", user=owner, company=company)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return sorted(row["name"] for row in (data["results"] if isinstance(data, dict) else data))
+
+    def test_request_with_company_sees_only_its_rows(self):
+        header = {"HTTP_X_COMPANY_ID": str(self.company.pk)}
+        self.assertEqual(self.names("/payments/banks/", **header), ["Banco C1"])
+        self.assertEqual(self.names("/clients/clients/", **header), ["Cliente C1"])
+
+    def test_request_without_company_sees_nothing(self):
+        self.assertEqual(self.names("/payments/banks/"), [])
+        self.assertEqual(self.names("/clients/clients/"), [])
+        # Eventos, contas e pagamentos pedem a empresa explicitamente
+        self.assertEqual(self.client.get("/events/").status_code, 400)
+        self.assertEqual(self.client.get("/payments/bills/").status_code, 400)
+
+    def test_request_with_malformed_company_sees_nothing(self):
+        self.assertEqual(self.names("/payments/banks/", HTTP_X_COMPANY_ID="abc"), [])
+
+    def test_create_without_company_is_refused(self):
+        response = self.client.post("/payments/banks/", {"name": "Sem empresa", "balance": "0.00"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bank.all_objects.filter(name="Sem empresa").exists())
+
+    def test_outside_a_request_nothing_is_filtered(self):
+        # Shell, Celery, migrations
+        self.assertEqual(Bank.objects.count(), 2)
+        with company_context(self.company.pk):
+            self.assertEqual(Bank.objects.count(), 1)
+        with company_context(None, required=True):
+            self.assertEqual(Bank.objects.count(), 0)
+        self.assertEqual(Event.objects.count(), 0)
@@ -1,12 +1,13 @@
 from rest_framework.exceptions import ValidationError
-from accounts.models import Company
+from accounts.tenant import resolve_company
 
 def get_company_or_404(request):
     company_id = request.headers.get("X-Company-ID")
     if not company_id:
         raise ValidationError({"detail": "Company ID not provided."})
 
-    try:
-        return Company.objects.get(id=company_id)
-    except Company.DoesNotExist:
-        raise ValidationError({"detail": "Company not found."})
\ No newline at end of file
+    # Resolvida uma vez pelo TenantMiddleware (cache em memória), sem query aqui
+    cached = resolve_company(request)
+    if cached is None:
+        raise ValidationError({"detail": "Company not found."})
+    return cached.company
\ No newline at end of file
@@ -50,13 +50,21 @@ def login(request):
             }
         return Response(response_data, status=status.HTTP_401_UNAUTHORIZED)
     
+def can_enroll(user, company):
+    return company is not None and user.is_authenticated and (user.is_superuser or user.role == "admin")
+
 @api_view(['POST'])
 def register(request):
         
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        response_data = {'data': serializer.data, 'message': 'User created successfully'}
+        # Cadastro feito por um admin da empresa do X-Company-ID (a autenticação já checou que é membro):
+        # o novo usuário entra nela. Cadastro anônimo não entra em nenhuma; o acesso é dado no admin (Company.members)
+        if can_enroll(request.user, request.company):
+            request.company.members.add(user)
+        companies = list(user.companies.order_by("id").values("id", "name"))
+        response_data = {'data': serializer.data, 'companies': companies, 'message': 'User created successfully'}
         return Response(response_data, status=status.HTTP_201_CREATED)
     else:
         return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -64,5 +72,5 @@ def register(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_user_companies(request):
-    companies = Company.objects.all().values("id", "name")
+    companies = request.user.companies.order_by("id").values("id", "name")
     return Response(list(companies))
\ No newline at end of file
@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from accounts.models import Company
+from accounts.tenant import TenantManager
 
 class Person(models.Model):
     name = models.CharField(max_length=255)  # Required
@@ -8,6 +10,10 @@ class Person(models.Model):
     address = models.TextField(blank=True, null=True)
     cpf_cnpj = models.CharField(max_length=18, blank=True, null=True)  # Accepts both CPF and CNPJ
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # Owner of the record
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)  # null = ainda sem empresa (assign_tenant_company)
+
+    objects = TenantManager()
+    all_objects = models.Manager()
 
     class Meta:
         abstract = True
@@ -18,9 +24,17 @@ class Person(models.Model):
 class Client(Person):
     legacy = models.IntegerField(null=True, unique=False)
     # Additional fields or methods specific to clients
-    pass
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "name"], name="client_company_name_idx"),
+        ]
 
 class Supplier(Person):
     legacy = models.IntegerField(null=True, unique=False)
     # Additional fields or methods specific to suppliers
-    pass
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "name"], name="supplier_company_name_idx"),
+        ]
@@ -5,12 +5,12 @@ class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user', 'company')
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user', 'company')
 
 
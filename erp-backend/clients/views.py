@@ -2,12 +2,8 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from .models import Client, Supplier
 from .serializers import ClientSerializer, SupplierSerializer
-from rest_framework.pagination import PageNumberPagination
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from erp_backend.pagination import StandardResultsSetPagination
+from accounts.utils import get_company_or_404
 
 class ClientViewSet(viewsets.ModelViewSet):
     serializer_class = ClientSerializer
@@ -40,7 +36,7 @@ class ClientViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         # Associate the new supplier with the authenticated user
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, company=get_company_or_404(self.request))
 
 class SupplierViewSet(viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
@@ -74,4 +70,4 @@ class SupplierViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         # Associate the new supplier with the authenticated user
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, company=get_company_or_404(self.request))
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+from celery.schedules import crontab
 from datetime import timedelta
 from corsheaders.defaults import default_headers
 
@@ -51,7 +52,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CompanyMemberJWTAuthentication",
     ),
 }
 
@@ -70,6 +71,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.tenant.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -129,6 +131,33 @@ DATABASES = {
 
 
 
+# Cache
+# Report outputs are cached in "reports" (payments.report_cache), keyed by a per-company data version.
+# Both live outside the process: every gunicorn worker and the Celery worker must see the same
+# versions, or a write handled by one of them never invalidates the others' reports.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'media' / 'report-cache',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 500,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Contadores de versão no banco: compartilhados por todos os processos e máquinas
+    'report_versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'report_cache_versions',
+        'TIMEOUT': None,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -170,3 +199,19 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Background report jobs (payments.report_jobs)
+REPORT_JOBS_ROOT = BASE_DIR / 'media' / 'reports'
+REPORT_JOBS_MAX_AGE_DAYS = 7
+
+# Periodic tasks (celery beat; django_celery_beat copies these into its PeriodicTask table)
+CELERY_BEAT_SCHEDULE = {
+    'snapshot-bank-balances': {
+        'task': 'payments.tasks.snapshot_bank_balances',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'purge-report-jobs': {
+        'task': 'payments.tasks.purge_report_jobs',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.models import Event
+from events.utils.settlement import refresh_event_settlement
+from payments.report_cache import bump_data_version_on_commit
+
+
+class Command(BaseCommand):
+    help = "Recomputes Event.settlement_status and Event.paid from the income allocations and their payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Events per UPDATE")
+
+    def handle(self, *args, **options):
+        ids = list(Event.objects.order_by("id").values_list("id", flat=True))
+        size = options["batch_size"]
+
+        count = 0
+        for start in range(0, len(ids), size):
+            with transaction.atomic():
+                count += refresh_event_settlement(ids[start:start + size])
+        bump_data_version_on_commit(None)
+
+        paid = Event.objects.filter(paid=True).count()
+        self.stdout.write(self.style.SUCCESS(f"{count} eventos recalculados, {paid} quitados"))
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_alter_client_address_alter_client_cpf_cnpj_and_more'),
+        ('events', '0013_alter_event_fiscal_doc'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date', 'id'], name='event_date_idx'),
+        ),
+    ]
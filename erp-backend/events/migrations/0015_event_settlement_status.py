@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_alter_client_address_alter_client_cpf_cnpj_and_more'),
+        ('events', '0014_event_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='settlement_status',
+            field=models.CharField(choices=[('em aberto', 'Em Aberto'), ('parcial', 'Parcial'), ('quitado', 'Quitado')], default='em aberto', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['paid', 'date', 'id'], name='event_paid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['settlement_status', 'date'], name='event_settlement_idx'),
+        ),
+    ]
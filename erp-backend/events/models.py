@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from clients.models import Client  # Import the Client model
 from accounts.models import Company
+from accounts.tenant import TenantManager
 
 class Event(models.Model):
     EVENT_TYPES = [
@@ -24,10 +25,29 @@ class Event(models.Model):
     date_end = models.DateField(null=True, blank=True)
     local = models.CharField(max_length=255, null=True, blank=True)
     fiscal_doc = models.CharField(max_length=255, null=True, blank=True)
-    paid = models.BooleanField(default=False)
+    SETTLEMENT_CHOICES = [
+        ("em aberto", "Em Aberto"),
+        ("parcial", "Parcial"),
+        ("quitado", "Quitado"),
+    ]
+
+    paid = models.BooleanField(default=False)  # mantido por events/utils/settlement.py
+    settlement_status = models.CharField(max_length=10, choices=SETTLEMENT_CHOICES, default="em aberto", editable=False)
 
     total_value = models.DecimalField(max_digits=10, decimal_places=2)
     legacy = models.IntegerField(null=True, unique=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)  # null = ainda sem empresa (assign_tenant_company)
+
+    objects = TenantManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date", "id"], name="event_date_idx"),
+            models.Index(fields=["company", "date", "id"], name="event_company_date_idx"),
+            models.Index(fields=["paid", "date", "id"], name="event_paid_date_idx"),
+            models.Index(fields=["settlement_status", "date"], name="event_settlement_idx"),
+        ]
 
     def __str__(self):
         return f"{self.event_name} - {self.client.name} ({self.date})"
@@ -17,5 +17,20 @@ class EventSerializer(serializers.ModelSerializer):
             "total_value",
             "local",
             "fiscal_doc",
+            "paid",
+            "settlement_status",
         ]
+        read_only_fields = ("paid", "settlement_status")
+
+    FINANCIAL_FIELDS = (
+        "total_receitas", "total_despesas", "saldo_evento", "valor_restante_pagar",
+        "valor_alocado", "valor_recebido_alocado",
+    )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Só com ?with_financials=1 (annotate_event_financials)
+        if hasattr(instance, "valor_restante_pagar"):
+            data["financial_summary"] = {field: getattr(instance, field) for field in self.FINANCIAL_FIELDS}
+        return data
 
@@ -1,3 +1,46 @@
+from datetime import date
+from decimal import Decimal
 from django.test import TestCase
+from accounts.models import Company, User
+from clients.models import Client
+from events.models import Event
+from events.utils.financials import annotate_event_financials, load_event_financials
+from payments.models import Bank, EventAllocation, Income, Payment
+from payments.totals import recompute_statuses
 
-# Create your tests here.
+
+class EventFinancialsTests(TestCase):
+    """The events summary report and the event detail agree on what an event has received."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        company = Company.objects.create(name="A")
+        client = Client.all_objects.create(name="Cliente", user=user, company=company)
+        bank = Bank.all_objects.create(name="Banco", balance=Decimal("0.00"), user=user, company=company)
+        cls.event = Event.all_objects.create(
+            user=user, company=company, event_name="Evento", type="outros", client=client,
+            date=date(2025, 1, 1), total_value=Decimal("1000.00"),
+        )
+        income = Income.objects.create(
+            user=user, company=company, person=client, description="Receita",
+            date_due=date(2025, 1, 10), value=Decimal("300.00"),
+        )
+        EventAllocation.objects.create(accrual=income, event=cls.event, value=Decimal("150.00"))
+        for value, status in (("100.00", "pago"), ("50.00", "agendado")):
+            Payment.objects.create(
+                user=user, company=company, bank=bank, income=income, value=Decimal(value),
+                date=date(2025, 1, 10), status=status,
+            )
+        recompute_statuses([income.pk], refresh_totals=True)
+
+    def test_paid_value_leaves_scheduled_payments_out(self):
+        values = load_event_financials([self.event])[self.event.pk]
+        # Metade da receita no evento: metade dos 100,00 pagos; os 50,00 agendados não contam
+        self.assertEqual(values["allocated_value"], Decimal("150.00"))
+        self.assertEqual(values["paid_value"], Decimal("50.00"))
+
+    def test_paid_value_matches_the_event_detail(self):
+        summary = annotate_event_financials(Event.all_objects.filter(pk=self.event.pk)).get()
+        paid_value = load_event_financials([self.event])[self.event.pk]["paid_value"]
+        self.assertEqual(paid_value, summary.valor_recebido_alocado)
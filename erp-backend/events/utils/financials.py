@@ -0,0 +1,71 @@
+from decimal import Decimal
+from django.db.models import DecimalField, ExpressionWrapper, F, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from events.utils.settlement import received_subquery
+from events.models import Event
+from payments.models import Bill, EventAllocation, Income
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def load_event_financials(events):
+    """
+    Contract, allocated and paid values of many events in a fixed number of queries.
+
+    allocated_value is the sum of the event's income allocations; paid_value is their received
+    part from the incomes' paid_total (scheduled payments left out), the same received_subquery
+    behind Event.paid and settlement_status. Returns {event_id: {...}}.
+    """
+    financials = {
+        event.id: {
+            "contract_value": event.total_value or Decimal("0.00"),
+            "allocated_value": Decimal("0.00"),
+            "paid_value": Decimal("0.00"),
+        }
+        for event in events
+    }
+    if not financials:
+        return financials
+
+    income_allocations = EventAllocation.objects.filter(
+        event_id__in=financials.keys(), accrual__income__isnull=False
+    )
+    allocated = income_allocations.order_by().values("event_id").annotate(total=Sum("value"))
+    for row in allocated:
+        financials[row["event_id"]]["allocated_value"] = row["total"] or Decimal("0.00")
+
+    received = Event.all_objects.filter(pk__in=financials.keys()).annotate(received=received_subquery())
+    for event_id, value in received.values_list("pk", "received"):
+        financials[event_id]["paid_value"] = value
+
+    return financials
+
+
+def _sum_subquery(queryset, field="value"):
+    """SUM(field) of a queryset correlated with the outer event, 0 when there are no rows."""
+    total = queryset.order_by().annotate(total=Func(F(field), function="SUM")).values("total")
+    return Coalesce(Subquery(total, output_field=MONEY), Value(Decimal("0.00")), output_field=MONEY)
+
+
+def annotate_event_financials(queryset):
+    """
+    Adds the event financial summary (EventDetailView and ?with_financials=1 on the list) to
+    every event of the queryset, as correlated subqueries in the same SELECT:
+
+    valor_alocado (income allocations), valor_recebido_alocado (their received part, the figure
+    behind Event.paid and settlement_status), valor_restante_pagar (contract - recebido),
+    and the cash of the incomes/bills linked by Income.event / Bill.event: total_receitas,
+    total_despesas and saldo_evento (receitas - despesas).
+    """
+    event = OuterRef("pk")
+    queryset = queryset.annotate(
+        valor_alocado=_sum_subquery(EventAllocation.objects.filter(event=event, accrual__income__isnull=False)),
+        valor_recebido_alocado=received_subquery(),
+        total_receitas=_sum_subquery(Income.objects.filter(event=event, status="pago")),
+        total_despesas=_sum_subquery(Bill.objects.filter(event=event, status="pago")),
+    )
+    return queryset.annotate(
+        saldo_evento=ExpressionWrapper(F("total_receitas") - F("total_despesas"), output_field=MONEY),
+        # Mesma definição de refresh_event_settlement: quitado <=> valor_restante_pagar <= 0
+        valor_restante_pagar=ExpressionWrapper(F("total_value") - F("valor_recebido_alocado"), output_field=MONEY),
+    )
@@ -1,39 +1,67 @@
 from decimal import Decimal
+from django.db.models import Q
+from payments.models import EventAllocation, Payment
+from payments.splits import payment_frame, allocation_frame, split_payments, remaining_cents, to_cents, from_cents
 
 def get_event_rows(event, model, user, mode):
     rows = []
     is_bill = model.__name__ == "Bill"
-    items = model.objects.filter(user=user, event_allocations__event_id=event.id).distinct()
+    items = list(
+        model.objects.filter(user=user, event_allocations__event_id=event.id).distinct().select_related("person")
+    )
+    accrual_ids = [item.id for item in items]
+
+    allocations = allocation_frame(
+        EventAllocation.objects.filter(event_id=event.id, accrual_id__in=accrual_ids),
+        sum_per=("accrual_id",),
+    )
+    allocations = allocations[allocations["total"] != 0]
+    allocated = dict(zip(allocations["accrual_id"], allocations["allocated"]))
+
+    if mode == "payments":
+        payments = list(
+            Payment.objects.filter(Q(bill_id__in=accrual_ids) | Q(income_id__in=accrual_ids)).order_by("id")
+        )
+        splits = split_payments(payment_frame(payments), allocations)
+        by_accrual = {}
+        for position, accrual_id, value in splits[["position", "accrual_id", "split"]].itertuples(index=False):
+            by_accrual.setdefault(accrual_id, []).append((payments[position], from_cents(value)))
+    elif mode == "remaining":
+        # Pago + agendado, das colunas guardadas na conta
+        paid = {item.id: to_cents(item.paid_total + item.scheduled_total) for item in items}
+        remaining = dict(zip(
+            allocations["accrual_id"],
+            remaining_cents(
+                allocations["allocated"].to_numpy(),
+                allocations["accrual_id"].map(paid).fillna(0).astype("int64").to_numpy(),
+                allocations["total"].to_numpy(),
+            ),
+        ))
 
     for item in items:
-        allocation = item.event_allocations.filter(event_id=event.id).first()
-        if not allocation or not item.value:
+        if item.id not in allocated:
             continue
 
         if mode == "accruals":
-            value = allocation.value
-        else:
-            ratio = allocation.value / item.value
-            total_paid_to_event = sum(p.value * ratio for p in item.payments.all())
-
-            if mode == "payments":
-                for p in item.payments.all():
-                    rows.append({
-                        "id": p.id,
-                        "date": p.date,
-                        "person": item.person.name,
-                        "description": item.description,
-                        "doc_number": p.doc_number or "DN",
-                        "value": round(p.value * ratio, 2),
-                        "is_bill": is_bill,
-                    })
-                continue
-            elif mode == "remaining":
-                value = allocation.value - total_paid_to_event
-                if value <= 0:
-                    continue
-            else:
+            value = from_cents(allocated[item.id])
+        elif mode == "payments":
+            for p, value in by_accrual.get(item.id, []):
+                rows.append({
+                    "id": p.id,
+                    "date": p.date,
+                    "person": item.person.name,
+                    "description": item.description,
+                    "doc_number": p.doc_number or "DN",
+                    "value": value,
+                    "is_bill": is_bill,
+                })
+            continue
+        elif mode == "remaining":
+            value = from_cents(remaining[item.id])
+            if value <= 0:
                 continue
+        else:
+            continue
 
         rows.append({
             "id": item.id,
@@ -0,0 +1,55 @@
+from decimal import Decimal
+from django.db.models import BooleanField, Case, DecimalField, F, Func, OuterRef, QuerySet, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from events.models import Event
+from payments.models import EventAllocation
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def received_subquery():
+    """
+    Part of the outer event's income allocations already received: SUM(allocation.value *
+    paid_total / income.value), from the stored accrual totals.
+    """
+    allocations = (
+        EventAllocation.objects.filter(event_id=OuterRef("pk"), accrual__income__isnull=False)
+        .exclude(accrual__value=0)
+        .order_by()
+        .annotate(total=Func(
+            F("value") * F("accrual__paid_total") / F("accrual__value"), function="SUM", output_field=MONEY
+        ))
+        .values("total")
+    )
+    received = Coalesce(Subquery(allocations, output_field=MONEY), Value(Decimal("0.00")), output_field=MONEY)
+    return Round(received, 2, output_field=MONEY)
+
+
+def refresh_event_settlement(events):
+    """
+    Recomputes settlement_status and paid of many events in one UPDATE:
+    quitado (and paid) when what was received covers total_value, parcial when something
+    was received, em aberto otherwise.
+
+    `events` is an Event queryset or an iterable of event ids (a values_list("event_id") of
+    allocations works too). Call it after anything that changes income allocations, the
+    paid total of an income or the contract value. Returns the number of events.
+    """
+    if not (isinstance(events, QuerySet) and events.model is Event):
+        events = Event.objects.filter(pk__in=events)
+
+    settled = LessThanOrEqual(F("total_value"), received_subquery())
+    return events.update(
+        settlement_status=Case(
+            When(settled, then=Value("quitado")),
+            When(GreaterThan(received_subquery(), 0), then=Value("parcial")),
+            default=Value("em aberto"),
+        ),
+        paid=Case(When(settled, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    )
+
+
+def events_of_accruals(accrual_ids):
+    """Ids of the events the incomes among these accruals are allocated to, as a subquery."""
+    return EventAllocation.objects.filter(accrual_id__in=accrual_ids, accrual__income__isnull=False).values("event_id")
@@ -13,15 +13,13 @@ from .models import Event
 from .serializers import EventSerializer
 from payments.models import Bill, Income, EventAllocation
 from events.utils.pdffunctions import truncate_text
+from events.utils.financials import load_event_financials, annotate_event_financials
+from events.utils.settlement import refresh_event_settlement
+from payments.report_cache import cached_report
 from payments.serializers import BillSerializer, IncomeSerializer
 from collections import defaultdict
 from decimal import Decimal
-from rest_framework.pagination import PageNumberPagination
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from erp_backend.pagination import StandardResultsSetPagination
 
 import locale
 try:
@@ -32,12 +30,9 @@ except:
 def format_currency(value: Decimal) -> str:
     return locale.currency(value, grouping=True)
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def generate_events_summary_report(request):
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    user = request.user
+def build_events_summary_report(company, params, user):
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
     
     events = Event.objects.all()
 
@@ -46,35 +41,20 @@ def generate_events_summary_report(request):
     if date_max:
         events = events.filter(date__lte=date_max)
 
-    events = events.order_by("date")
+    events = list(events.select_related("client").order_by("date"))
+    financials = load_event_financials(events)
 
     event_data = []
     for event in events:
-        # Contract value
-        contract_value = event.total_value or Decimal('0.00')
-
-        # Allocated value
-        allocations = EventAllocation.objects.filter(
-            event=event,
-            accrual__in=Income.objects.all()
-        )
-        allocated_value = allocations.aggregate(total=Sum('value'))['total'] or Decimal('0.00')
-
-        # Paid value
-        incomes = Income.objects.filter(event_allocations__event=event).distinct()
-        total_paid = Decimal('0.00')
-        for income in incomes:
-            for payment in income.payments.all():
-                total_paid += Decimal(payment.get_allocated_value_to_event(event.id))
-
+        values = financials[event.id]
         event_data.append({
             "id": event.id,
             "name": event.event_name,
             "date": event.date,
             "client": event.client.name if event.client else "-",
-            "contract_value": contract_value,
-            "allocated_value": allocated_value,
-            "paid_value": total_paid
+            "contract_value": values["contract_value"],
+            "allocated_value": values["allocated_value"],
+            "paid_value": values["paid_value"]
         })
 
     # PDF generation
@@ -159,12 +139,17 @@ def generate_events_summary_report(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(len(event_data))
     return response
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_event_type_monthly_report(request):
-    year = request.query_params.get("year")
+@cached_report("eventos", cross_company=True)
+def generate_events_summary_report(request):
+    return build_events_summary_report(request.company, request.query_params, request.user)
+
+def build_event_type_monthly_report(company, params, user):
+    year = params.get("year")
     if not year:
         return Response({"error": "Year parameter is required."}, status=400)
 
@@ -173,8 +158,6 @@ def generate_event_type_monthly_report(request):
     except ValueError:
         return Response({"error": "Year must be an integer."}, status=400)
 
-    user = request.user
-    company = get_company_or_404(request)
     event_type_labels = dict(Event.EVENT_TYPES)
     data = defaultdict(lambda: defaultdict(lambda: Decimal("0.00")))
 
@@ -307,6 +290,12 @@ def generate_event_type_monthly_report(request):
 
     return response
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cached_report("eventos_tipo", cross_company=True)
+def generate_event_type_monthly_report(request):
+    return build_event_type_monthly_report(get_company_or_404(request), request.query_params, request.user)
+
 class EventDetailView(generics.RetrieveAPIView):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
@@ -321,74 +310,91 @@ class EventDetailView(generics.RetrieveAPIView):
         # ✅ Fetch paid Incomes linked to the event
         incomes = Income.objects.filter(event=event, status="pago")
         incomes_data = IncomeSerializer(incomes, many=True).data
-        total_incomes = sum(income.value for income in incomes)
 
         # ✅ Fetch paid Bills linked to the event
         bills = Bill.objects.filter(event=event, status="pago")
         bills_data = BillSerializer(bills, many=True).data
-        total_bills = sum(bill.value for bill in bills)
 
-        saldo_evento = total_incomes - total_bills
-        valor_restante_pagar = event.total_value - total_incomes
+        # Mesmo resumo da lista (?with_financials=1); o restante a pagar segue Event.paid
+        summary = annotate_event_financials(Event.objects.filter(pk=event.pk)).get()
 
         return Response({
             "event": event_data,
             "bills": bills_data,
             "incomes": incomes_data,
-            "financial_summary": {
-                "total_receitas": total_incomes,
-                "total_despesas": total_bills,
-                "saldo_evento": saldo_evento,
-                "valor_restante_pagar": valor_restante_pagar
-            }
+            "financial_summary": {field: getattr(summary, field) for field in EventSerializer.FINANCIAL_FIELDS}
         }, status=status.HTTP_200_OK)
 
+
+def event_list_queryset(company, params):
+    """Events of the company filtered by the EventViewSet query params (explain_hot_queries uses it too)."""
+    queryset = Event.all_objects.filter(company=company).select_related("client")
+
+    # Filters from query params
+    id = params.get("id")
+    event_name = params.get("event_name")
+    client = params.get("client")
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    min_value = params.get("min_value")
+    max_value = params.get("max_value")
+    event_types = params.getlist("type")
+    local = params.get("local")
+    fiscal_doc = params.get("fiscal_doc")
+    paid = params.get("paid")
+
+    # Apply filters dynamically
+    if id:
+        queryset = queryset.filter(id=id)
+    if event_name:
+        queryset = queryset.filter(event_name__icontains=event_name)
+    if client:
+        queryset = queryset.filter(client__name__icontains=client)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if min_value:
+        queryset = queryset.filter(total_value__gte=min_value)
+    if max_value:
+        queryset = queryset.filter(total_value__lte=max_value)
+    if event_types:
+        queryset = queryset.filter(type__in=event_types)
+    if local:
+        queryset = queryset.filter(local__icontains=local)
+    if fiscal_doc:
+        queryset = queryset.filter(fiscal_doc=fiscal_doc)
+
+    # Quitado = recebido dos rateios cobre o contrato (coluna mantida, indexada)
+    if paid in ("true", "1"):
+        queryset = queryset.filter(paid=True)
+    elif paid in ("false", "0"):
+        queryset = queryset.filter(paid=False)
+    settlement = params.getlist("settlement_status")
+    if settlement:
+        queryset = queryset.filter(settlement_status__in=settlement)
+
+    # Resumo financeiro por evento na mesma query (subqueries correlacionadas)
+    if params.get("with_financials") in ("1", "true"):
+        queryset = annotate_event_financials(queryset)
+
+    return queryset.order_by("date", "id")
+
+
 class EventViewSet(viewsets.ModelViewSet):
     serializer_class = EventSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Event.objects.all()
-        params = self.request.query_params
-
-        # Filters from query params
-        id = params.get("id")
-        event_name = params.get("event_name")
-        client = params.get("client")
-        start_date = params.get("start_date")
-        end_date = params.get("end_date")
-        min_value = params.get("min_value")
-        max_value = params.get("max_value")
-        event_types = params.getlist("type")
-        local = params.get("local")
-        fiscal_doc = params.get("fiscal_doc")
-        paid = params.get("paid")
-
-        # Apply filters dynamically
-        if id:
-            queryset = queryset.filter(id=id)
-        if event_name:
-            queryset = queryset.filter(event_name__icontains=event_name)
-        if client:
-            queryset = queryset.filter(client__name__icontains=client)
-        if start_date:
-            queryset = queryset.filter(date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date__lte=end_date)
-        if min_value:
-            queryset = queryset.filter(total_value__gte=min_value)
-        if max_value:
-            queryset = queryset.filter(total_value__lte=max_value)
-        if event_types:
-            queryset = queryset.filter(type__in=event_types)
-        if local:
-            queryset = queryset.filter(local__icontains=local)
-        if fiscal_doc:
-            queryset = queryset.filter(fiscal_doc=fiscal_doc)
-
-        return queryset.order_by("date")
+        return event_list_queryset(get_company_or_404(self.request), self.request.query_params)
         
     def perform_create(self, serializer):
         # Associate the new supplier with the authenticated user
-        serializer.save(user=self.request.user)
+        event = serializer.save(user=self.request.user, company=get_company_or_404(self.request))
+        refresh_event_settlement([event.pk])
+
+    def perform_update(self, serializer):
+        # total_value pode ter mudado
+        event = serializer.save()
+        refresh_event_settlement([event.pk])
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+# A payment points to its accrual either through `bill` or through `income`.
+ACCRUAL_SIDES = ("bill", "income")
+
+# Accounts reported on their own line instead of with their group (10101 = Recebimento Bruto).
+SPECIAL_CODES = ("10101",)
+
+# Accrual statuses counted by each status filter of the cost center report.
+COST_CENTER_STATUSES = {
+    "pago": ["pago", "parcial"],
+    "em_aberto": ["em aberto", "parcial"],
+}
+NO_COST_CENTER = "#Sem Centro"
+
+
+def allocation_split(side):
+    """SQL expression for allocation.value * payment.value / accrual.value on one accrual side."""
+    return ExpressionWrapper(
+        F(f"{side}__allocations__value") * F("value") / F(f"{side}__value"),
+        output_field=DecimalField(max_digits=28, decimal_places=12),
+    )
+
+
+def chart_account_totals(payments):
+    """
+    Sums the paid value of `payments` per chart account in one grouped query per accrual side.
+
+    Each payment is split over the account allocations of its Bill/Income proportionally
+    to allocation.value / accrual.value. Accruals with value 0 are ignored.
+    Returns a dict {chart_account_id: Decimal}.
+    """
+    totals = defaultdict(Decimal)
+
+    for side in ACCRUAL_SIDES:
+        rows = (
+            payments.filter(**{f"{side}__isnull": False})
+            .exclude(**{f"{side}__value": 0})
+            .order_by()
+            .values(chart_account_id=F(f"{side}__allocations__chart_account_id"))
+            .annotate(total=Sum(allocation_split(side)))
+        )
+        for row in rows:
+            if row["chart_account_id"] is not None and row["total"] is not None:
+                totals[row["chart_account_id"]] += row["total"]
+
+    return totals
+
+
+def chart_group_totals(payments, period=None):
+    """
+    Sums the paid value of `payments` per ChartAccount.group, split like chart_account_totals,
+    in one grouped query per accrual side.
+
+    Keys are (group, code): the group lowercased ("" when empty) and the account code when it
+    is one of SPECIAL_CODES, "" otherwise. With `period` (e.g. TruncMonth("date")) the key starts
+    with the period, so many periods come out of the same queries.
+    Returns a dict {key: Decimal}.
+    """
+    totals = defaultdict(Decimal)
+
+    for side in ACCRUAL_SIDES:
+        account = f"{side}__allocations__chart_account"
+        keys = {
+            "group": F(f"{account}__group"),
+            "code": Case(
+                When(**{f"{account}__code__in": SPECIAL_CODES}, then=F(f"{account}__code")),
+                default=Value(""),
+            ),
+        }
+        if period is not None:
+            keys["period"] = period
+
+        rows = (
+            payments.filter(**{f"{side}__isnull": False})
+            .exclude(**{f"{side}__value": 0})
+            .order_by()
+            .values(**keys)
+            .annotate(total=Sum(allocation_split(side)))
+        )
+        for row in rows:
+            if row["total"] is None:
+                continue
+            # lower() em Python: o lower() do banco nem sempre trata acentos ("PRÓ-LABORE")
+            key = ((row["group"] or "").lower(), row["code"])
+            if period is not None:
+                key = (row["period"],) + key
+            totals[key] += row["total"]
+
+    return totals
+
+
+def cost_center_totals(payments, side, status="todos", by_month=False):
+    """
+    Sums `payments` of one accrual side ("bill" or "income") per cost center name in one
+    grouped query, keeping only accruals in the statuses of `status` (see COST_CENTER_STATUSES).
+
+    Returns rows {"label", "total"} (plus "month" with by_month) sorted by total, highest first;
+    by_month sorts by month first.
+    """
+    payments = payments.filter(**{f"{side}__isnull": False})
+    if status in COST_CENTER_STATUSES:
+        payments = payments.filter(**{f"{side}__status__in": COST_CENTER_STATUSES[status]})
+
+    keys = {"label": Coalesce(F(f"{side}__cost_center__name"), Value(NO_COST_CENTER))}
+    ordering = ["-total", "label"]
+    if by_month:
+        keys["month"] = TruncMonth("date")
+        ordering.insert(0, "month")
+
+    return list(payments.order_by().values(**keys).annotate(total=Sum("value")).order_by(*ordering))
+
+
+def rollup_chart_accounts(totals, accounts):
+    """
+    Rolls per-account totals up the ChartAccount.parent tree.
+
+    Returns (totals_with_children, parent_children) where parent_children maps a parent id
+    to the ids of its direct children.
+    """
+    parent_children = defaultdict(list)
+    for acc in accounts:
+        if acc.parent_id:
+            parent_children[acc.parent_id].append(acc.id)
+
+    totals_with_children = {}
+
+    def sum_children(account_id):
+        total = totals.get(account_id, Decimal("0.00"))
+        for child_id in parent_children.get(account_id, []):
+            total += sum_children(child_id)
+        totals_with_children[account_id] = total
+        return total
+
+    for acc in accounts:
+        if acc.parent_id is None:
+            sum_children(acc.id)
+
+    return totals_with_children, parent_children
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        # Sinais do livro de movimentos (saldo inicial de bancos novos) e da invalidação do
+        # cache de relatórios, também em processos que não carregam as views (Celery)
+        from . import ledger, report_cache  # noqa: F401
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from django.db import connection, connections, transaction
+from .models import Accrual, Income, EventAllocation, AccountAllocation
+from .report_cache import bump_data_version_on_commit
+from events.utils.settlement import refresh_event_settlement
+
+BATCH_SIZE = 500
+
+
+def _insert_child_rows(model, objs, using):
+    """
+    One INSERT with the Bill/Income table rows (accrual_ptr + the child's own columns) of `objs`.
+
+    QuerySet.bulk_create refuses multi-table inheritance and the only ORM path that writes the
+    child table alone is private (Manager._insert), so this is the one place with raw SQL.
+    Values go through each field's get_db_prep_save, as the ORM would.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = model._meta.local_concrete_fields
+    row = "(%s)" % ", ".join(["%s"] * len(fields))
+    sql = "INSERT INTO %s (%s) VALUES %s" % (
+        quote(model._meta.db_table),
+        ", ".join(quote(field.column) for field in fields),
+        ", ".join([row] * len(objs)),
+    )
+    params = [field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in objs for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _insert_accruals(model, accruals):
+    """Accrual rows with bulk_create, then the Bill/Income rows with the ids it returned."""
+    parent_fields = Accrual._meta.concrete_fields
+
+    for start in range(0, len(accruals), BATCH_SIZE):
+        batch = accruals[start:start + BATCH_SIZE]
+        parents = [
+            Accrual(**{field.attname: getattr(accrual, field.attname) for field in parent_fields})
+            for accrual in batch
+        ]
+        Accrual.objects.bulk_create(parents)
+        for accrual, parent in zip(batch, parents):
+            accrual.id = accrual.pk = parent.pk
+            accrual._state.adding = False
+            accrual._state.db = parent._state.db
+        _insert_child_rows(model, batch, using=parents[0]._state.db)
+
+
+def bulk_create_accruals(model, items, **extra):
+    """
+    Writes validated Bill/Income data (serializer validated_data, with their nested
+    event_allocations / account_allocations) with batched INSERTs.
+
+    `extra` goes to every accrual (user, company). Returns the created objects in input order.
+    """
+    accruals, event_allocations, account_allocations = [], [], []
+    for data in items:
+        data = dict(data)
+        event_allocations.append(data.pop("event_allocations", []))
+        account_allocations.append(data.pop("account_allocations", []))
+        accruals.append(model(**data, **extra))
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            _insert_accruals(model, accruals)
+        else:
+            # Sem RETURNING não há como saber os ids gerados; grava um a um
+            for accrual in accruals:
+                accrual.save()
+
+        EventAllocation.objects.bulk_create(
+            [
+                EventAllocation(accrual_id=accrual.pk, **allocation)
+                for accrual, allocations in zip(accruals, event_allocations)
+                for allocation in allocations
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        AccountAllocation.objects.bulk_create(
+            [
+                AccountAllocation(accrual_id=accrual.pk, **allocation)
+                for accrual, allocations in zip(accruals, account_allocations)
+                for allocation in allocations
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        if model is Income:
+            refresh_event_settlement({
+                allocation["event"].pk for allocations in event_allocations for allocation in allocations
+            })
+
+    # bulk_create não dispara post_save
+    for company_id in {accrual.company_id for accrual in accruals}:
+        bump_data_version_on_commit(company_id)
+    return accruals
+
+
+def sync_allocations(accrual, model, key, items):
+    """
+    Makes the `model` allocations (EventAllocation or AccountAllocation) of an accrual match
+    `items` (validated dicts with `key` and value), touching only what changed: one
+    bulk_update, one bulk_create and one DELETE at most.
+
+    Rows are matched by `key` ("event" / "chart_account"); unchanged rows are left alone.
+    """
+    existing = defaultdict(list)
+    for allocation in model.objects.filter(accrual=accrual).order_by("id"):
+        existing[getattr(allocation, f"{key}_id")].append(allocation)
+
+    to_create, to_update = [], []
+    for item in items:
+        matches = existing.get(item[key].pk)
+        if matches:
+            allocation = matches.pop(0)
+            if allocation.value != item["value"]:
+                allocation.value = item["value"]
+                to_update.append(allocation)
+        else:
+            to_create.append(model(accrual=accrual, **item))
+
+    to_delete = [allocation.pk for rows in existing.values() for allocation in rows]
+    if to_delete:
+        model.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        model.objects.bulk_update(to_update, ["value"])
+    if to_create:
+        model.objects.bulk_create(to_create)
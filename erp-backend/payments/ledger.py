@@ -0,0 +1,125 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Bank, BankMovement, BankBalanceSnapshot
+
+# Data do movimento "saldo inicial": antes de qualquer pagamento, mesmo os lançados com data
+# retroativa, então todo saldo de abertura/fechamento o inclui
+OPENING_BALANCE_DATE = datetime.date.min
+
+
+def payment_signed_value(payment):
+    """Effect of a paid payment on its bank: bills take money out, incomes bring it in."""
+    if payment.bill_id:
+        return -payment.value
+    if payment.income_id:
+        return payment.value
+    return Decimal("0.00")
+
+
+def record_movement(bank_id, value, date, kind="pagamento", payment=None, description=""):
+    """Appends a movement to the ledger and shifts the snapshots it falls before."""
+    if not bank_id or not value:
+        return None
+
+    movement = BankMovement.objects.create(
+        bank_id=bank_id,
+        payment=payment,
+        date=date,
+        value=value,
+        kind=kind,
+        description=description,
+    )
+
+    # Snapshots are closing balances, so every day from `date` on now includes this movement
+    BankBalanceSnapshot.objects.filter(bank_id=bank_id, date__gte=date).update(balance=F("balance") + value)
+    return movement
+
+
+@receiver(post_save, sender=Bank)
+def record_opening_balance(sender, instance, created, raw=False, **kwargs):
+    """Every new bank (API, admin, ORM) starts its ledger with its balance as the opening entry."""
+    if created and not raw:
+        record_movement(instance.pk, instance.balance, OPENING_BALANCE_DATE, kind="saldo inicial")
+
+
+def record_payment_movement(payment, reverse=False):
+    """Writes the ledger entry for a payment being settled, or its reversal."""
+    value = payment_signed_value(payment)
+    if reverse:
+        # O pagamento pode estar sendo apagado, então o estorno não fica vinculado a ele
+        return record_movement(
+            payment.bank_id, -value, payment.date, kind="estorno",
+            description=f"Estorno do pagamento {payment.id}",
+        )
+    return record_movement(payment.bank_id, value, payment.date, payment=payment)
+
+
+def shift_balances(deltas):
+    """
+    Applies {bank_id: value} to Bank.balance with UPDATE ... SET balance = balance + value.
+
+    No read-modify-write, so concurrent payments on the same bank do not lose updates; banks
+    are updated in id order so two transactions moving money between the same banks lock
+    the rows in the same order.
+    """
+    for bank_id in sorted(deltas):
+        if bank_id and deltas[bank_id]:
+            Bank.all_objects.filter(pk=bank_id).update(balance=F("balance") + deltas[bank_id])
+
+
+def apply_payment(payment, reverse=False):
+    """Moves a paid payment into (or, reversed, out of) its bank: balance and ledger entry."""
+    value = payment_signed_value(payment)
+    shift_balances({payment.bank_id: -value if reverse else value})
+    return record_payment_movement(payment, reverse=reverse)
+
+
+def record_payment_movements(payments):
+    """
+    Bulk record_payment_movement for payments being settled together: one INSERT for the
+    movements and one snapshot shift per (bank, date).
+    """
+    movements = [
+        BankMovement(bank_id=p.bank_id, payment=p, date=p.date, value=payment_signed_value(p))
+        for p in payments if p.bank_id and payment_signed_value(p)
+    ]
+    BankMovement.objects.bulk_create(movements, batch_size=1000)
+
+    shifts = defaultdict(Decimal)
+    for movement in movements:
+        shifts[(movement.bank_id, movement.date)] += movement.value
+    for (bank_id, date), value in sorted(shifts.items()):
+        BankBalanceSnapshot.objects.filter(bank_id=bank_id, date__gte=date).update(balance=F("balance") + value)
+    return movements
+
+
+def balance_at(bank_id, date):
+    """Closing balance of a bank at the end of `date`: latest snapshot plus the movements after it."""
+    snapshot = BankBalanceSnapshot.objects.filter(bank_id=bank_id, date__lte=date).order_by("-date").first()
+    movements = BankMovement.objects.filter(bank_id=bank_id, date__lte=date)
+    return _apply_movements(snapshot, movements)
+
+
+def balance_before(bank_id, date):
+    """Opening balance of a bank on `date` (closing balance of the previous day)."""
+    snapshot = BankBalanceSnapshot.objects.filter(bank_id=bank_id, date__lt=date).order_by("-date").first()
+    movements = BankMovement.objects.filter(bank_id=bank_id, date__lt=date)
+    return _apply_movements(snapshot, movements)
+
+
+def _apply_movements(snapshot, movements):
+    balance = Decimal("0.00")
+    if snapshot:
+        balance = snapshot.balance
+        movements = movements.filter(date__gt=snapshot.date)
+    return balance + (movements.aggregate(total=Sum("value"))["total"] or Decimal("0.00"))
+
+
+def take_snapshot(bank_id, date):
+    balance = balance_at(bank_id, date)
+    BankBalanceSnapshot.objects.update_or_create(bank_id=bank_id, date=date, defaults={"balance": balance})
+    return balance
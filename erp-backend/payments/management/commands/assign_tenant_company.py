@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from accounts.models import Company
+from clients.models import Client, Supplier
+from events.models import Event
+from payments.models import Bank, Bill, EventAllocation, Income, Payment
+from payments.report_cache import bump_data_version_on_commit
+from payments.tenant_backfill import assign_companies
+
+# Modelo -> (linhas que o usam, campo que aponta para ele, empresa dessas linhas)
+USAGES = {
+    Client: (Income.objects, "person", "company"),
+    Supplier: (Bill.objects, "person", "company"),
+    Bank: (Payment.objects, "bank", "company"),
+    Event: (EventAllocation.objects, "event", "accrual__company"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Assigns a company to the clients, suppliers, banks and events that have none, from the "
+        "incomes, bills, payments and allocations that use them. Rows without company are not "
+        "visible to any company; --company assigns the ones left to an explicit company."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Company that receives every row still without company")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be assigned")
+
+    def handle(self, *args, **options):
+        company = None
+        if options["company"]:
+            company = Company.objects.filter(pk=options["company"]).first()
+            if company is None:
+                raise CommandError(f"Empresa {options['company']} não encontrada.")
+
+        with transaction.atomic():
+            assigned = assign_companies(apps)
+            for model, (usages, field, usage_company) in USAGES.items():
+                name = model._meta.model_name
+                if company is not None:
+                    assigned[name] += model.all_objects.filter(company=None).update(company=company)
+                left = model.all_objects.filter(company=None).count()
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {assigned[name]} atribuídos, {left} sem empresa")
+                # Usados por outra empresa além da atribuída: precisam ser duplicados/corrigidos à mão
+                shared = (
+                    usages.exclude(**{usage_company: None})
+                    .exclude(**{usage_company: F(f"{field}__company")})
+                    .values(field).distinct().count()
+                )
+                if shared:
+                    self.stdout.write(self.style.WARNING(
+                        f"    {shared} {model._meta.verbose_name_plural} também usados por outra empresa"
+                    ))
+
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+            else:
+                bump_data_version_on_commit(None)
+
+        self.stdout.write(self.style.SUCCESS("Simulação, nada foi gravado" if options["dry_run"] else "Empresas atribuídas"))
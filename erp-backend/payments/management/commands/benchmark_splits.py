@@ -0,0 +1,48 @@
+import random
+import time
+from decimal import Decimal
+import numpy as np
+from django.core.management.base import BaseCommand
+from payments.splits import split_cents, from_cents
+
+
+class Command(BaseCommand):
+    help = "Compares the Decimal loop with the vectorized payment split on synthetic data (no database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=100_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        size = options["payments"]
+
+        # Contas de até R$ 100 mil, alocações e pagamentos menores que a conta
+        totals = np.array([rng.randint(1, 10_000_000) for _ in range(size)], dtype=np.int64)
+        allocated = np.array([rng.randint(0, int(t)) for t in totals], dtype=np.int64)
+        paid = np.array([rng.randint(1, int(t)) for t in totals], dtype=np.int64)
+
+        decimal_rows = [
+            (from_cents(p), from_cents(a), from_cents(t)) for p, a, t in zip(paid, allocated, totals)
+        ]
+
+        started = time.perf_counter()
+        decimal_total = Decimal("0.00")
+        for payment_value, allocation_value, accrual_value in decimal_rows:
+            ratio = allocation_value / accrual_value if accrual_value else 0
+            decimal_total += round(payment_value * ratio, 2)
+        decimal_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vector_total = from_cents(split_cents(paid, allocated, totals).sum())
+        vector_seconds = time.perf_counter() - started
+
+        self.stdout.write(f"{size} pagamentos")
+        self.stdout.write(f"Decimal:   {decimal_seconds * 1000:9.1f} ms  total {decimal_total}")
+        self.stdout.write(f"Vetorial:  {vector_seconds * 1000:9.1f} ms  total {vector_total}")
+        self.stdout.write(f"Ganho:     {decimal_seconds / vector_seconds:9.1f}x")
+
+        if decimal_total != vector_total:
+            self.stderr.write(self.style.ERROR("Os totais não batem"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Totais iguais ao centavo"))
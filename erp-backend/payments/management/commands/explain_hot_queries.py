@@ -0,0 +1,232 @@
+import random
+import re
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from accounts.models import Company
+from accounts.tenant import company_context
+from clients.models import Client, Supplier
+from events.models import Event
+from events.views import event_list_queryset
+from payments.bulk import BATCH_SIZE, bulk_create_accruals
+from payments.models import AccountAllocation, Accrual, Bank, Bill, ChartAccount, EventAllocation, Income, Payment
+from payments.views import accrual_list_queryset, payment_list_queryset
+
+# Tabelas que crescem com o uso; scan sequencial nelas é o que o comando procura
+LARGE_TABLES = {
+    "payments_accrual",
+    "payments_bill",
+    "payments_income",
+    "payments_payment",
+    "payments_eventallocation",
+    "payments_accountallocation",
+    "events_event",
+}
+
+SEQ_SCAN_PATTERNS = {
+    # "Seq Scan on payments_payment" / "Parallel Seq Scan on ..."
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    # "SCAN payments_payment" (sem "USING INDEX"): leitura da tabela inteira
+    "sqlite": re.compile(r"\bSCAN (\w+)(?! USING)(?:\s|$)"),
+}
+
+
+def query(**params):
+    """Query params as the views read them (request.query_params); lists become repeated keys."""
+    query_dict = QueryDict(mutable=True)
+    for key, value in params.items():
+        query_dict.setlist(key, value if isinstance(value, list) else [value])
+    return query_dict
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the canonical query of each hot view and fails when any of them reads "
+        "a large table with a sequential scan. By default it builds a synthetic dataset inside "
+        "a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000, help="Synthetic bills + incomes")
+        parser.add_argument("--companies", type=int, default=20)
+        parser.add_argument("--existing", action="store_true", help="Explain against the current data instead")
+        parser.add_argument("--company", type=int, help="Company used with --existing (default: the first)")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan in full")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQ_SCAN_PATTERNS:
+            raise CommandError(f"Banco '{connection.vendor}' não suportado (postgresql ou sqlite).")
+
+        if options["existing"]:
+            companies = Company.objects.order_by("id")
+            company = companies.filter(pk=options["company"]).first() if options["company"] else companies.first()
+            if company is None:
+                raise CommandError("Nenhuma empresa encontrada.")
+            failures = self.check_plans(company, options["verbose_plans"])
+        else:
+            with transaction.atomic():
+                company = self.build_dataset(options["rows"], options["companies"])
+                failures = self.check_plans(company, options["verbose_plans"])
+                # Nada do conjunto sintético fica no banco
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} consulta(s) com scan sequencial: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Todas as consultas usam índice"))
+
+    # Consultas
+
+    def canonical_queries(self, company):
+        """(name, queryset) of the query each hot path runs, built by the views' own queryset functions where possible."""
+        today = timezone.localdate()
+        event = Event.all_objects.filter(company=company).first()
+        chart_account = ChartAccount.objects.filter(children__isnull=True).first()
+        doc_number = Accrual.objects.filter(company=company).exclude(doc_number=None).values_list("doc_number", flat=True).first()
+        open_statuses = list(Accrual.OPEN_STATUSES)
+
+        with company_context(company.pk):
+            return [
+                ("contas (lista)", accrual_list_queryset(Bill, company, query())[:10]),
+                ("contas (status em aberto)", accrual_list_queryset(Bill, company, query(status=open_statuses))[:10]),
+                ("contas (doc_number)", accrual_list_queryset(Bill, company, query(doc_number=doc_number or "-"))),
+                ("receitas (lista)", accrual_list_queryset(Income, company, query())[:10]),
+                ("pagamentos (lista)", payment_list_queryset(company, query())[:10]),
+                ("pagamentos (agendados)", payment_list_queryset(company, query(status="agendado"))[:10]),
+                ("relatório de agendados", Payment.objects.filter(
+                    company=company, status="agendado", date__gte=today, date__lte=today + timedelta(days=30)
+                ).order_by("date")),
+                ("espelho (contas do período)", Bill.objects.filter(
+                    company__in=[company], date_due__gte=today - timedelta(days=30), date_due__lte=today
+                ).order_by("date_due")),
+                ("update_overdue_status", Bill.objects.filter(status="em aberto", date_due__lt=today)),
+                ("rateios do evento", EventAllocation.objects.filter(event_id=event.pk if event else 0).values("accrual_id")),
+                ("rateios da conta contábil", AccountAllocation.objects.filter(
+                    chart_account_id=chart_account.pk if chart_account else 0
+                ).values("accrual_id")),
+                ("plano de contas (code)", ChartAccount.objects.filter(code="10101")),
+                ("eventos (lista)", event_list_queryset(company, query())[:10]),
+            ]
+
+    def check_plans(self, company, verbose=False):
+        pattern = SEQ_SCAN_PATTERNS[connection.vendor]
+        failures = []
+        for name, queryset in self.canonical_queries(company):
+            plan = queryset.explain()
+            scans = sorted({table for table in pattern.findall(plan) if table in LARGE_TABLES})
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"✗ {name}: scan sequencial em {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"✓ {name}")
+            if verbose or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+        return failures
+
+    # Conjunto sintético
+
+    def build_dataset(self, rows, company_count):
+        """
+        Companies with people, banks, events, bills, incomes, payments and allocations,
+        shaped like a running installation: the past mostly paid, open accruals in the future
+        and a handful overdue (update_overdue_status runs every day). Returns one of the companies.
+        """
+        started = time.monotonic()
+        rng = random.Random(42)
+        today = timezone.localdate()
+        user = get_user_model().objects.create_user(
+            username=f"explain-{int(time.time())}", email=f"explain-{int(time.time())}@example.com",
+            cpf=str(int(time.time()))[-11:], password=None,
+        )
+
+        companies = Company.objects.bulk_create([Company(name=f"Sintética {i}") for i in range(company_count)])
+        clients, suppliers, banks, events = {}, {}, {}, {}
+        for company in companies:
+            clients[company.pk] = Client.all_objects.bulk_create(
+                [Client(name=f"Cliente {i}", user=user, company=company) for i in range(20)]
+            )
+            suppliers[company.pk] = Supplier.all_objects.bulk_create(
+                [Supplier(name=f"Fornecedor {i}", user=user, company=company) for i in range(20)]
+            )
+            banks[company.pk] = Bank.all_objects.bulk_create(
+                [Bank(name=f"Banco {i}", balance=Decimal("0.00"), user=user, company=company) for i in range(3)]
+            )
+        for company in companies:
+            events[company.pk] = Event.all_objects.bulk_create([
+                Event(
+                    user=user, company=company, event_name=f"Evento {i}", type="outros",
+                    client=rng.choice(clients[company.pk]), total_value=Decimal("10000.00"),
+                    date=today + timedelta(days=rng.randint(-1000, 180)),
+                )
+                for i in range(max(rows // company_count // 20, 1))
+            ])
+        chart_accounts = ChartAccount.objects.bulk_create(
+            [ChartAccount(code=f"9{i:04d}", description=f"Conta sintética {i}") for i in range(40)]
+        )
+
+        def accrual_items(person_map):
+            items = []
+            for i in range(rows // 2):
+                company = rng.choice(companies)
+                due = today + timedelta(days=rng.randint(-1000, 180))
+                if due >= today:
+                    status = "em aberto"
+                else:
+                    status = rng.choices(["pago", "vencido", "parcial", "em aberto"], [90, 5, 5, 0.05])[0]
+                items.append({
+                    "description": f"Sintética {i}",
+                    "date_due": due,
+                    "value": Decimal(rng.randint(1000, 500000)) / 100,
+                    "doc_number": f"NF{i}",
+                    "status": status,
+                    "company": company,
+                    "person": rng.choice(person_map[company.pk]),
+                })
+            return items
+
+        bills = bulk_create_accruals(Bill, accrual_items(suppliers), user=user)
+        incomes = bulk_create_accruals(Income, accrual_items(clients), user=user)
+        accruals = bills + incomes
+
+        EventAllocation.objects.bulk_create(
+            [
+                EventAllocation(accrual_id=accrual.pk, event=rng.choice(events[accrual.company_id]), value=accrual.value)
+                for accrual in accruals if rng.random() < 0.5
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        AccountAllocation.objects.bulk_create(
+            [
+                AccountAllocation(accrual_id=accrual.pk, chart_account=rng.choice(chart_accounts), value=accrual.value)
+                for accrual in accruals
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        payments = []
+        for accrual in accruals:
+            if accrual.status in ("pago", "parcial") or rng.random() < 0.05:
+                scheduled = accrual.status == "em aberto"
+                payments.append(Payment(
+                    user=user, company_id=accrual.company_id, bank=rng.choice(banks[accrual.company_id]),
+                    bill_id=accrual.pk if isinstance(accrual, Bill) else None,
+                    income_id=accrual.pk if isinstance(accrual, Income) else None,
+                    value=accrual.value, status="agendado" if scheduled else "pago",
+                    date=accrual.date_due, doc_number=accrual.doc_number,
+                ))
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+
+        # Estatísticas novas para o planejador
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        self.stdout.write(
+            f"Conjunto sintético: {company_count} empresas, {len(accruals)} contas, {len(payments)} pagamentos "
+            f"({time.monotonic() - started:.1f}s)"
+        )
+        return companies[0]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from payments.models import Accrual
+from payments.report_cache import bump_data_version_on_commit
+from payments.totals import rebuild_accrual_totals, recompute_statuses
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored paid_total / scheduled_total of the accruals from their payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Only rebuild the accruals of this company id")
+        parser.add_argument("--status", action="store_true", help="Also recompute the status from the new totals")
+
+    def handle(self, *args, **options):
+        accruals = Accrual.objects.all()
+        if options["company"]:
+            accruals = accruals.filter(company_id=options["company"])
+
+        with transaction.atomic():
+            count = rebuild_accrual_totals(accruals)
+            statuses = 0
+            if options["status"]:
+                # Contas agendadas ficam como estão, como nas telas de pagamento
+                statuses = recompute_statuses(accruals.exclude(status="agendado"))
+            bump_data_version_on_commit(options["company"])
+
+        self.stdout.write(self.style.SUCCESS(f"{count} contas recalculadas, {statuses} status recalculados"))
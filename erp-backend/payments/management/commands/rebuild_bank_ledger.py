@@ -0,0 +1,54 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from payments.models import Bank, BankMovement, BankBalanceSnapshot, Payment
+from payments.ledger import OPENING_BALANCE_DATE, payment_signed_value
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the bank movement ledger and daily balance snapshots from the paid payments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bank", type=int, help="Only rebuild this bank id")
+
+    def handle(self, *args, **options):
+        banks = Bank.all_objects.all()
+        if options["bank"]:
+            banks = banks.filter(id=options["bank"])
+
+        for bank in banks:
+            with transaction.atomic():
+                movements, snapshots = self.rebuild(bank)
+            self.stdout.write(f"{bank.name}: {movements} movimentos, {snapshots} snapshots")
+
+    def rebuild(self, bank):
+        BankMovement.objects.filter(bank=bank).delete()
+        BankBalanceSnapshot.objects.filter(bank=bank).delete()
+
+        payments = list(
+            Payment.objects.filter(bank=bank, status="pago").order_by("date", "id")
+        )
+
+        # O saldo atual é a verdade; o que não é explicado pelos pagamentos vira saldo inicial
+        opening = bank.balance - sum((payment_signed_value(p) for p in payments), Decimal("0.00"))
+
+        movements = [
+            BankMovement(bank=bank, date=OPENING_BALANCE_DATE, value=opening, kind="saldo inicial")
+        ]
+        movements += [
+            BankMovement(bank=bank, payment=p, date=p.date, value=payment_signed_value(p))
+            for p in payments
+        ]
+        BankMovement.objects.bulk_create(movements, batch_size=1000)
+
+        closing = {}
+        balance = Decimal("0.00")
+        for movement in movements:
+            balance += movement.value
+            closing[movement.date] = balance
+
+        BankBalanceSnapshot.objects.bulk_create(
+            [BankBalanceSnapshot(bank=bank, date=date, balance=value) for date, value in closing.items()],
+            batch_size=1000,
+        )
+        return len(movements), len(closing)
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    ChartAccount = apps.get_model('payments', 'ChartAccount')
+    accounts = list(ChartAccount.objects.all())
+    by_id = {acc.id: acc for acc in accounts}
+
+    def build_path(acc):
+        if acc.path:
+            return acc.path
+        parent = by_id.get(acc.parent_id)
+        acc.path = f"{build_path(parent) if parent else ''}{acc.id}/"
+        return acc.path
+
+    for acc in accounts:
+        build_path(acc)
+    ChartAccount.objects.bulk_update(accounts, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0029_income_expected_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chartaccount',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chartaccount',
+            index=models.Index(fields=['path'], name='chartaccount_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
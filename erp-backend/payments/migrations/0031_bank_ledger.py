@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0030_chartaccount_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='payments.bank')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bank', 'date'), name='bank_snapshot_unique_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BankMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('kind', models.CharField(choices=[('pagamento', 'Pagamento'), ('estorno', 'Estorno'), ('ajuste', 'Ajuste'), ('saldo inicial', 'Saldo Inicial')], default='pagamento', max_length=20)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='payments.bank')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_movements', to='payments.payment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bank', 'date'], name='bankmovement_bank_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:27
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Accrual = apps.get_model('payments', 'Accrual')
+    Payment = apps.get_model('payments', 'Payment')
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+
+    def total(status):
+        payments = (
+            Payment.objects.filter(Q(bill_id=OuterRef('pk')) | Q(income_id=OuterRef('pk')), status=status)
+            .order_by()
+            .annotate(total=Func(F('value'), function='SUM'))
+            .values('total')
+        )
+        return Coalesce(Subquery(payments, output_field=money), Value(Decimal('0.00')), output_field=money)
+
+    Accrual.objects.update(paid_total=total('pago'), scheduled_total=total('agendado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0032_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accrual',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='accrual',
+            name='scheduled_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_totals, reverse_code=migrations.RunPython.noop),
+    ]
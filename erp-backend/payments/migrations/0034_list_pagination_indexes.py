@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_user_company'),
+        ('events', '0014_event_date_index'),
+        ('payments', '0033_accrual_payment_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accrual',
+            index=models.Index(fields=['company', 'date_due', 'id'], name='accrual_company_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['company', 'status', '-date', '-id'], name='payment_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_company_members'),
+        ('events', '0016_event_company'),
+        ('payments', '0035_bank_company'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accountallocation',
+            name='chart_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='payments.chartaccount'),
+        ),
+        migrations.AlterField(
+            model_name='eventallocation',
+            name='event',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='events.event'),
+        ),
+        migrations.AddIndex(
+            model_name='accountallocation',
+            index=models.Index(fields=['chart_account', 'accrual'], name='accountalloc_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accrual',
+            index=models.Index(fields=['company', 'status', 'date_due'], name='accrual_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accrual',
+            index=models.Index(condition=models.Q(('status__in', ('em aberto', 'vencido', 'parcial'))), fields=['date_due'], name='accrual_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accrual',
+            index=models.Index(condition=models.Q(('status__in', ('em aberto', 'vencido', 'parcial'))), fields=['company', 'date_due'], name='accrual_open_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accrual',
+            index=models.Index(fields=['company', 'doc_number'], name='accrual_doc_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chartaccount',
+            index=models.Index(fields=['code'], name='chartaccount_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventallocation',
+            index=models.Index(fields=['event', 'accrual'], name='eventalloc_event_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'agendado')), fields=['company', 'date'], name='payment_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:56
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Tabela do cache "report_versions" (DatabaseCache); não faz nada se já existir
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0036_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:20
+
+from django.db import migrations
+from payments.tenant_backfill import assign_companies
+
+
+def backfill_company(apps, schema_editor):
+    # Linhas sem empresa deixam de ser visíveis para todas; o que sobrar vai com assign_tenant_company --company
+    assign_companies(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0009_person_company'),
+        ('events', '0016_event_company'),
+        ('payments', '0037_report_cache_versions_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_company, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:05
+
+import datetime
+from django.db import migrations
+from django.db.models import F
+
+OPENING_BALANCE_DATE = datetime.date.min
+
+
+def move_opening_balances(apps, schema_editor):
+    BankMovement = apps.get_model("payments", "BankMovement")
+    BankBalanceSnapshot = apps.get_model("payments", "BankBalanceSnapshot")
+
+    openings = BankMovement.objects.filter(kind="saldo inicial").exclude(date=OPENING_BALANCE_DATE)
+    for movement in openings:
+        # Fechamentos anteriores à data antiga passam a incluir o saldo inicial
+        BankBalanceSnapshot.objects.filter(bank_id=movement.bank_id, date__lt=movement.date).update(
+            balance=F("balance") + movement.value
+        )
+        movement.date = OPENING_BALANCE_DATE
+        movement.save(update_fields=["date"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0038_backfill_tenant_company'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_opening_balances, reverse_code=migrations.RunPython.noop),
+    ]
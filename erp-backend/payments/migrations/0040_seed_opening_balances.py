@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+import datetime
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import F, Sum
+
+OPENING_BALANCE_DATE = datetime.date.min
+
+
+def seed_opening_balances(apps, schema_editor):
+    Bank = apps.get_model("payments", "Bank")
+    BankMovement = apps.get_model("payments", "BankMovement")
+    BankBalanceSnapshot = apps.get_model("payments", "BankBalanceSnapshot")
+
+    # Bancos criados pelo admin/ORM ficaram sem saldo inicial no livro; ele é o que os
+    # movimentos existentes não explicam do saldo atual
+    banks = Bank.objects.exclude(movements__kind="saldo inicial")
+    for bank in banks:
+        moved = BankMovement.objects.filter(bank=bank).aggregate(total=Sum("value"))["total"] or Decimal("0.00")
+        opening = bank.balance - moved
+        if not opening:
+            continue
+        BankMovement.objects.create(
+            bank=bank, date=OPENING_BALANCE_DATE, value=opening, kind="saldo inicial"
+        )
+        BankBalanceSnapshot.objects.filter(bank=bank).update(balance=F("balance") + opening)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0039_opening_balance_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_opening_balances, reverse_code=migrations.RunPython.noop),
+    ]
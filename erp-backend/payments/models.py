@@ -1,6 +1,10 @@
+import uuid
 from django.db import models
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
 from accounts.models import Company
+from accounts.tenant import TenantManager
 from events.models import Event  # Import Event model
 from django.utils.timezone import now
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -32,6 +36,44 @@ class Accrual(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='em aberto')
     cost_center = models.ForeignKey(CostCenter, on_delete=models.SET_NULL, null=True, blank=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
+    # Somas dos pagamentos pagos / agendados, mantidas por payments/totals.py
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    scheduled_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    TOTAL_FIELDS = ("paid_total", "scheduled_total")
+    # Ainda há algo a pagar/receber
+    OPEN_STATUSES = ("em aberto", "vencido", "parcial")
+
+    class Meta:
+        indexes = [
+            # Listagens de contas/receitas (ordem date_due, id; paginação por cursor)
+            models.Index(fields=["company", "date_due", "id"], name="accrual_company_due_idx"),
+            # Listagens filtradas por status
+            models.Index(fields=["company", "status", "date_due"], name="accrual_company_status_idx"),
+            # Só as contas em aberto: update_overdue_status e relatórios de pendências
+            models.Index(
+                fields=["date_due"], name="accrual_open_due_idx",
+                condition=Q(status__in=("em aberto", "vencido", "parcial")),
+            ),
+            models.Index(
+                fields=["company", "date_due"], name="accrual_open_company_idx",
+                condition=Q(status__in=("em aberto", "vencido", "parcial")),
+            ),
+            models.Index(fields=["company", "doc_number"], name="accrual_doc_number_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Os totais só mudam por UPDATE com F(); um save() comum não pode gravar um valor velho por cima
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def remaining_value(self):
+        return self.value - self.paid_total
 
 
 class Income(Accrual):
@@ -68,6 +110,14 @@ class Payment(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pago')
 
+    class Meta:
+        indexes = [
+            # Listagem de pagamentos (ordem -date, -id; paginação por cursor)
+            models.Index(fields=["company", "status", "-date", "-id"], name="payment_company_date_idx"),
+            # Só os agendados: relatório de agendados e marcar-pago
+            models.Index(fields=["company", "date"], name="payment_scheduled_idx", condition=Q(status="agendado")),
+        ]
+
     @property
     def payable(self):
         return self.bill or self.income
@@ -79,19 +129,49 @@ class Payment(models.Model):
         alloc = None
         total = None
 
+        # Várias alocações da mesma conta no mesmo evento contam somadas
         if self.bill:
-            alloc = self.bill.event_allocations.filter(event_id=event_id).first()
+            alloc = self.bill.event_allocations.filter(event_id=event_id).aggregate(total=Sum("value"))["total"]
             total = self.bill.value
         elif self.income:
-            alloc = self.income.event_allocations.filter(event_id=event_id).first()
+            alloc = self.income.event_allocations.filter(event_id=event_id).aggregate(total=Sum("value"))["total"]
             total = self.income.value
 
         if not alloc or not total:
             return 0
 
-        ratio = alloc.value / total if total else 0
+        ratio = alloc / total if total else 0
         return round(self.value * ratio, 2)
 
+    @classmethod
+    def get_allocated_values_to_events(cls, payments, event_ids):
+        """
+        Bulk version of get_allocated_value_to_event.
+
+        `payments` is a Payment queryset or a list of payments. Returns
+        {(payment_id, event_id): value} for every pair whose accrual is allocated to the event,
+        with the same rules (allocations of an accrual to one event summed) and rounding, from a
+        single allocation fetch.
+        """
+        # pandas/numpy só quando usado: migrate e o Celery beat importam os models sem precisar deles
+        from .splits import payment_frame, allocation_frame, split_payments, from_cents
+
+        payments = payment_frame(payments)
+        allocations = allocation_frame(
+            EventAllocation.objects.filter(
+                accrual_id__in=payments["accrual_id"].unique().tolist(), event_id__in=event_ids
+            ),
+            "event_id",
+            sum_per=("accrual_id", "event_id"),
+        )
+        allocations = allocations[allocations["total"] != 0]
+
+        allocated = {}
+        splits = split_payments(payments, allocations)
+        for payment_id, event_id, value in splits[["payment_id", "event_id", "split"]].itertuples(index=False):
+            allocated[(int(payment_id), int(event_id))] = from_cents(value)
+        return allocated
+
 
 
 class Bank(models.Model):
@@ -99,9 +179,56 @@ class Bank(models.Model):
     name = models.CharField(max_length=255)
     balance = models.DecimalField(max_digits=12, decimal_places=2)
     legacy = models.IntegerField(null=True, unique=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)  # null = ainda sem empresa (assign_tenant_company)
+
+    objects = TenantManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "name"], name="bank_company_name_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - R$ {self.balance:.2f}"
+
+
+class BankMovement(models.Model):
+    """Append-only ledger of every change applied to Bank.balance."""
+    KIND_CHOICES = [
+        ('pagamento', 'Pagamento'),
+        ('estorno', 'Estorno'),
+        ('ajuste', 'Ajuste'),
+        ('saldo inicial', 'Saldo Inicial'),
+    ]
+
+    bank = models.ForeignKey(Bank, on_delete=models.CASCADE, related_name="movements")
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name="bank_movements")
+    date = models.DateField()
+    value = models.DecimalField(max_digits=12, decimal_places=2)  # positivo = entrada, negativo = saída
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='pagamento')
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["bank", "date"], name="bankmovement_bank_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.bank.name} {self.date} R$ {self.value}"
+
+
+class BankBalanceSnapshot(models.Model):
+    """Closing balance of a bank at the end of a day."""
+    bank = models.ForeignKey(Bank, on_delete=models.CASCADE, related_name="snapshots")
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["bank", "date"], name="bank_snapshot_unique_day"),
+        ]
     
 class ChartAccount(models.Model):
     code = models.CharField(max_length=20)
@@ -114,19 +241,91 @@ class ChartAccount(models.Model):
         blank=True,
         related_name="children"
     )
+    # Materialized path of ids ("1/5/12/"), kept in sync by save()
+    path = models.CharField(max_length=255, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["path"], name="chartaccount_path_idx", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["code"], name="chartaccount_code_idx"),
+        ]
 
     def __str__(self):
         return f"{self.code} - {self.description}"
 
+    def save(self, *args, **kwargs):
+        old_path = ChartAccount.objects.filter(pk=self.pk).values_list("path", flat=True).first() if self.pk else None
+        super().save(*args, **kwargs)
+
+        parent_path = ""
+        if self.parent_id:
+            parent_path = ChartAccount.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or ""
+        new_path = f"{parent_path}{self.pk}/"
+        if new_path == old_path:
+            return
+
+        ChartAccount.objects.filter(pk=self.pk).update(path=new_path)
+        self.path = new_path
+
+        # Reparented: move the whole subtree to the new prefix
+        if old_path:
+            ChartAccount.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr("path", len(old_path) + 1))
+            )
+
+    def get_descendants(self, include_self=True):
+        queryset = ChartAccount.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
     
 class AccountAllocation(models.Model):
     accrual = models.ForeignKey(Accrual, on_delete=models.CASCADE, related_name="allocations")  # bill or income
-    chart_account = models.ForeignKey(ChartAccount, on_delete=models.CASCADE)
+    chart_account = models.ForeignKey(ChartAccount, on_delete=models.CASCADE, db_index=False)
     value = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Substitui o índice simples da FK chart_account
+            models.Index(fields=["chart_account", "accrual"], name="accountalloc_account_idx"),
+        ]
+
 class EventAllocation(models.Model):
     accrual = models.ForeignKey(Accrual, on_delete=models.CASCADE, related_name="event_allocations")
-    event = models.ForeignKey(Event, on_delete=models.CASCADE)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, db_index=False)
     value = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Substitui o índice simples da FK event
+            models.Index(fields=["event", "accrual"], name="eventalloc_event_idx"),
+        ]
+
 
+class ReportJob(models.Model):
+    """A PDF/JSON report rendered in the background by Celery."""
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="report_jobs")
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
+    report = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    file_path = models.CharField(max_length=500, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+    duration_ms = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.report} ({self.status})"
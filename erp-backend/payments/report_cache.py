@@ -0,0 +1,180 @@
+import hashlib
+import json
+import time
+from functools import wraps
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from accounts.models import Company
+from events.models import Event
+from .models import (
+    Accrual, Bill, Income, Payment, EventAllocation, AccountAllocation,
+    ChartAccount, CostCenter, Bank, BankMovement
+)
+
+REPORT_CACHE_ALIAS = "reports"
+VERSION_CACHE_ALIAS = "report_versions"
+GLOBAL_SCOPE = "global"
+ANY_SCOPE = "any"  # muda a cada escrita de qualquer empresa
+HITS_KEY = "report-cache:hits"
+MISSES_KEY = "report-cache:misses"
+
+
+def report_cache():
+    return caches[REPORT_CACHE_ALIAS]
+
+
+def version_cache():
+    return caches[VERSION_CACHE_ALIAS]
+
+
+def data_version(company_id=None):
+    """Current data version of a company (or of the data shared by every company)."""
+    key = f"report-version:{company_id or GLOBAL_SCOPE}"
+    # Começa num valor novo se a chave foi descartada, para nunca reaproveitar entradas antigas
+    return version_cache().get_or_set(key, time.time_ns(), None)
+
+
+def bump_data_version(company_id=None):
+    """Invalidates every cached report of a company; without a company, of all companies."""
+    cache = version_cache()
+    for scope in (company_id or GLOBAL_SCOPE, ANY_SCOPE):
+        key = f"report-version:{scope}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def bump_data_version_on_commit(company_id=None):
+    transaction.on_commit(lambda: bump_data_version(company_id))
+
+
+def _count(key):
+    cache = report_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cache_stats():
+    cache = report_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+def cache_key(name, company_id, params, cross_company=False):
+    """Report name + company + normalized params + current data versions."""
+    normalized = sorted((key, sorted(values)) for key, values in params.items())
+    versions = [data_version(company_id), data_version()]
+    if cross_company:
+        versions.append(data_version(ANY_SCOPE))
+    raw = json.dumps([name, company_id, normalized, versions], cls=DjangoJSONEncoder)
+    return f"report:{name}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def cached_value(name, company_id, params, compute, cross_company=False):
+    """Returns the cached result of `compute()` (report rows, totals, bytes...) for these parameters."""
+    cache = report_cache()
+    key = cache_key(name, company_id, params, cross_company)
+    value = cache.get(key)
+    if value is not None:
+        _count(HITS_KEY)
+        return value
+
+    _count(MISSES_KEY)
+    value = compute()
+    if value is not None:
+        cache.set(key, value)
+    return value
+
+
+def cached_report(name, cross_company=False, per_user=False):
+    """
+    Caches the rendered output of a report view.
+
+    Goes between @permission_classes and the view function so it runs after authentication.
+    Reports that read data of other companies than X-Company-ID must pass cross_company=True;
+    those whose rows depend on who asks (the companies the user is a member of) per_user=True.
+    Error and streaming responses are never cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            company_id = request.headers.get("X-Company-ID")
+            params = {key: request.query_params.getlist(key) for key in request.query_params}
+            params.update({f"url:{key}": [str(value)] for key, value in kwargs.items()})
+            if per_user:
+                params["user:id"] = [str(request.user.pk)]
+
+            cache = report_cache()
+            key = cache_key(name, company_id, params, cross_company)
+            payload = cache.get(key)
+            if payload is not None:
+                _count(HITS_KEY)
+                response = HttpResponse(payload["content"])
+                for header, value in payload["headers"].items():
+                    response[header] = value
+                return response
+
+            _count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+            # Respostas DRF (erros de validação) e streaming não entram no cache
+            if response.status_code == 200 and not response.streaming and not hasattr(response, "data"):
+                cache.set(key, {"content": response.content, "headers": dict(response.items())})
+            return response
+        return wrapper
+    return decorator
+
+
+# 🔄 Qualquer escrita nos dados dos relatórios invalida o cache da empresa
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=Income)
+@receiver(post_delete, sender=Income)
+def bump_company_version(sender, instance, **kwargs):
+    bump_data_version_on_commit(instance.company_id)
+
+
+@receiver(post_save, sender=EventAllocation)
+@receiver(post_delete, sender=EventAllocation)
+@receiver(post_save, sender=AccountAllocation)
+@receiver(post_delete, sender=AccountAllocation)
+def bump_allocation_version(sender, instance, **kwargs):
+    company_id = Accrual.objects.filter(pk=instance.accrual_id).values_list("company_id", flat=True).first()
+    bump_data_version_on_commit(company_id)
+
+
+@receiver(post_save, sender=ChartAccount)
+@receiver(post_delete, sender=ChartAccount)
+@receiver(post_save, sender=CostCenter)
+@receiver(post_delete, sender=CostCenter)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+@receiver(post_save, sender=BankMovement)
+@receiver(post_delete, sender=BankMovement)
+def bump_global_version(sender, instance, **kwargs):
+    bump_data_version_on_commit()
+
+
+@receiver(m2m_changed, sender=Company.members.through)
+def bump_membership_version(sender, instance, action, reverse, **kwargs):
+    # Relatórios por usuário mudam com as empresas dele; instance é o usuário quando reverse
+    if action.startswith("post_"):
+        bump_data_version_on_commit(None if reverse else instance.pk)
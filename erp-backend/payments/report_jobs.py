@@ -0,0 +1,85 @@
+import json
+import time
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from django.http import Http404, QueryDict
+from django.utils.module_loading import import_string
+from accounts.tenant import company_context
+from .models import ReportJob
+
+# Report name -> function(company, params, user) that renders it; the synchronous endpoints call the same ones
+REPORTS = {
+    "pagamentos": "payments.views.build_payments_report",
+    "centro_custo": "payments.views.build_cost_center_consolidated_report",
+    "plano_contas": "payments.views.build_chart_account_balance",
+    "plano_contas_resumo": "payments.views.build_chartaccount_summary_report",
+    "extrato_bancario": "payments.views.build_bank_statement_report",
+    "espelho": "payments.views.build_quadro_espelho_report",
+    "realizado": "payments.views.build_quadro_realizado_report",
+    "agendados": "payments.views.build_scheduled_payments_report",
+    "eventos": "events.views.build_events_summary_report",
+    "eventos_tipo": "events.views.build_event_type_monthly_report",
+}
+
+EXTENSIONS = {
+    "application/pdf": "pdf",
+    "application/json": "json",
+}
+
+
+def job_params(params):
+    """The job's JSON params as a QueryDict, what the reports read from request.query_params."""
+    query = QueryDict(mutable=True)
+    for key, value in params.items():
+        query.setlist(key, [str(item) for item in value] if isinstance(value, list) else [str(value)])
+    return query
+
+
+def render_report(job):
+    """Renders the job's report for its company and user with the job's parameters."""
+    build = import_string(REPORTS[job.report])
+    with company_context(job.company_id):
+        return build(job.company, job_params(job.params), job.user)
+
+
+def run_job(job_id):
+    job = ReportJob.objects.select_related("user", "company").get(id=job_id)
+    job.status = "processando"
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+
+    started = time.monotonic()
+    try:
+        response = render_report(job)
+        if response.status_code >= 400:
+            # Erros de parâmetro voltam como Response do DRF, ainda sem renderizar
+            job.status = "erro"
+            job.error = json.dumps(response.data, ensure_ascii=False, default=str)
+        else:
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            content_type = response.get("Content-Type", "application/pdf").split(";")[0]
+            root = Path(settings.REPORT_JOBS_ROOT)
+            root.mkdir(parents=True, exist_ok=True)
+            path = root / f"{job.id}.{EXTENSIONS.get(content_type, 'bin')}"
+            path.write_bytes(content)
+
+            job.status = "concluido"
+            job.file_path = str(path)
+            job.content_type = content_type
+            rows = response.get("X-Report-Rows")
+            job.row_count = int(rows) if rows else None
+    except Http404 as exc:
+        # get_object_or_404 de um filtro (event_id, bank_id...) que não existe
+        job.status = "erro"
+        job.error = str(exc)
+    except Exception as exc:
+        job.status = "erro"
+        job.error = repr(exc)
+        raise
+    finally:
+        job.duration_ms = int((time.monotonic() - started) * 1000)
+        job.finished_at = timezone.now()
+        job.save()
+
+    return job
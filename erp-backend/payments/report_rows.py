@@ -0,0 +1,100 @@
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import EventAllocation
+from .splits import split_cents, remaining_cents, to_cents, from_cents
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def event_allocation_subquery(event_id, accrual_ref="pk"):
+    """Sum of the allocations of the outer accrual to the event (None when not allocated)."""
+    allocations = (
+        EventAllocation.objects.filter(accrual_id=accrual_ref, event_id=event_id)
+        .order_by()
+        .values("accrual_id")
+        .annotate(total=Sum("value"))
+        .values("total")
+    )
+    return Subquery(allocations, output_field=MONEY)
+
+
+def open_accrual_rows(accruals, event_id=None):
+    """
+    Rows of the accruals that still have something to pay (discounting paid and scheduled
+    payments, from the stored totals), in one query.
+
+    With an event only the event's part counts: the allocation minus the payments split
+    proportionally (allocation.value / accrual.value).
+    """
+    accruals = accruals.select_related("person")
+    if event_id:
+        accruals = accruals.annotate(event_allocated=event_allocation_subquery(event_id, OuterRef("pk")))
+        items = [item for item in accruals if item.event_allocated is not None]
+        remaining = remaining_cents(
+            [to_cents(item.event_allocated) for item in items],
+            [to_cents(item.paid_total + item.scheduled_total) for item in items],
+            [to_cents(item.value) for item in items],
+        )
+    else:
+        items = list(accruals)
+        remaining = [to_cents(item.value - item.paid_total - item.scheduled_total) for item in items]
+
+    rows = []
+    for item, value in zip(items, remaining):
+        value = from_cents(value)
+        if value <= 0:
+            continue
+        rows.append({
+            "id": item.id,
+            "date": item.date_due,
+            "person": item.person.name if item.person else "-",
+            "description": item.description,
+            "doc_number": item.doc_number or "DN",
+            "value": value,
+            "expected_date": getattr(item, "expected_date", None),
+        })
+    return rows
+
+
+def paid_payment_rows(payments, event_id=None):
+    """
+    Rows of the payments split into (bills, incomes), in one query.
+
+    With an event each payment shows only its share of the event allocation; payments of
+    accruals not allocated to the event are left out.
+    """
+    payments = payments.select_related("bill", "income", "bill__person", "income__person")
+    if event_id:
+        accrual = Coalesce(OuterRef("bill_id"), OuterRef("income_id"))
+        payments = [
+            p for p in payments.annotate(event_allocated=event_allocation_subquery(event_id, accrual))
+            if p.event_allocated is not None
+        ]
+        values = [
+            from_cents(value) for value in split_cents(
+                [to_cents(p.value) for p in payments],
+                [to_cents(p.event_allocated) for p in payments],
+                [to_cents(p.payable.value) for p in payments],
+            )
+        ]
+    else:
+        payments = list(payments)
+        values = [round(p.value, 2) for p in payments]
+
+    bills, incomes = [], []
+    for p, value in zip(payments, values):
+        accrual = p.payable
+        row = {
+            "id": p.id,
+            "date": p.date,
+            "person": accrual.person.name if accrual.person else "-",
+            "description": p.description,
+            "doc_number": p.doc_number or "DN",
+            "value": value,
+            "expected_date": getattr(accrual, "expected_date", None),
+        }
+        if p.bill:
+            bills.append(row)
+        elif p.income:
+            incomes.append(row)
+    return bills, incomes
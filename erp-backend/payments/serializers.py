@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
-from .models import Bill, Income, Bank, Payment, CostCenter, EventAllocation, AccountAllocation, ChartAccount
+from .models import Bill, Income, Bank, Payment, CostCenter, EventAllocation, AccountAllocation, ChartAccount, ReportJob
+from .bulk import sync_allocations
+from events.utils.settlement import refresh_event_settlement
 
 class EventAllocationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,7 +23,13 @@ class ChartAccountSerializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'description', 'parent', 'children']
 
     def get_children(self, obj):
-        return ChartAccountSerializer(obj.children.all(), many=True).data
+        # The viewset hands over the whole tree fetched in a single query
+        children_map = self.context.get("children_map")
+        if children_map is None:
+            children = obj.children.all()
+        else:
+            children = children_map.get(obj.id, [])
+        return ChartAccountSerializer(children, many=True, context=self.context).data
 
 class BillSerializer(serializers.ModelSerializer):
     person_name = serializers.CharField(source="person.name", read_only=True)
@@ -38,8 +47,8 @@ class BillSerializer(serializers.ModelSerializer):
     def get_remaining_value(self, obj):
         if obj.status != "parcial":
             return None
-        total_paid = sum(p.value for p in obj.payments.all())
-        return obj.value - total_paid
+        # Despesas descontam também o que já está agendado
+        return obj.remaining_value - obj.scheduled_total
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -47,32 +56,30 @@ class BillSerializer(serializers.ModelSerializer):
         data["account_allocations"] = AccountAllocationSerializer(instance.allocations.all(), many=True).data
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         event_allocations_data = validated_data.pop('event_allocations', [])
         account_allocations_data = validated_data.pop('account_allocations', [])
 
         bill = super().create(validated_data)
 
-        for allocation in event_allocations_data:
-            EventAllocation.objects.create(accrual=bill, **allocation)
-        for allocation in account_allocations_data:
-            AccountAllocation.objects.create(accrual=bill, **allocation)
+        sync_allocations(bill, EventAllocation, "event", event_allocations_data)
+        sync_allocations(bill, AccountAllocation, "chart_account", account_allocations_data)
 
         return bill
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        event_allocations_data = validated_data.pop('event_allocations', [])
-        account_allocations_data = validated_data.pop('account_allocations', [])
+        # Rateios ausentes no PATCH ficam como estão; lista vazia apaga todos
+        event_allocations_data = validated_data.pop('event_allocations', None)
+        account_allocations_data = validated_data.pop('account_allocations', None)
 
         instance = super().update(instance, validated_data)
 
-        instance.event_allocations.all().delete()
-        for allocation in event_allocations_data:
-            EventAllocation.objects.create(accrual=instance, **allocation)
-
-        instance.allocations.all().delete()
-        for allocation in account_allocations_data:
-            AccountAllocation.objects.create(accrual=instance, **allocation)
+        if event_allocations_data is not None:
+            sync_allocations(instance, EventAllocation, "event", event_allocations_data)
+        if account_allocations_data is not None:
+            sync_allocations(instance, AccountAllocation, "chart_account", account_allocations_data)
 
         return instance
 
@@ -92,8 +99,7 @@ class IncomeSerializer(serializers.ModelSerializer):
     def get_remaining_value(self, obj):
         if obj.status != "parcial":
             return None
-        total_paid = sum(p.value for p in obj.payments.filter(status="pago"))
-        return obj.value - total_paid
+        return obj.remaining_value
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -101,32 +107,35 @@ class IncomeSerializer(serializers.ModelSerializer):
         data["account_allocations"] = AccountAllocationSerializer(instance.allocations.all(), many=True).data
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         event_allocations_data = validated_data.pop('event_allocations', [])
         account_allocations_data = validated_data.pop('account_allocations', [])
 
         income = super().create(validated_data)
 
-        for allocation in event_allocations_data:
-            EventAllocation.objects.create(accrual=income, **allocation)
-        for allocation in account_allocations_data:
-            AccountAllocation.objects.create(accrual=income, **allocation)
+        sync_allocations(income, EventAllocation, "event", event_allocations_data)
+        sync_allocations(income, AccountAllocation, "chart_account", account_allocations_data)
+        refresh_event_settlement({allocation["event"].pk for allocation in event_allocations_data})
 
         return income
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        event_allocations_data = validated_data.pop('event_allocations', [])
-        account_allocations_data = validated_data.pop('account_allocations', [])
+        # Rateios ausentes no PATCH ficam como estão; lista vazia apaga todos
+        event_allocations_data = validated_data.pop('event_allocations', None)
+        account_allocations_data = validated_data.pop('account_allocations', None)
+        # Eventos de antes e de depois: o valor e os rateios mudam o recebido de ambos
+        events = set(instance.event_allocations.values_list("event_id", flat=True))
 
         instance = super().update(instance, validated_data)
 
-        instance.event_allocations.all().delete()
-        for allocation in event_allocations_data:
-            EventAllocation.objects.create(accrual=instance, **allocation)
-
-        instance.allocations.all().delete()
-        for allocation in account_allocations_data:
-            AccountAllocation.objects.create(accrual=instance, **allocation)
+        if event_allocations_data is not None:
+            sync_allocations(instance, EventAllocation, "event", event_allocations_data)
+            events.update(allocation["event"].pk for allocation in event_allocations_data)
+        if account_allocations_data is not None:
+            sync_allocations(instance, AccountAllocation, "chart_account", account_allocations_data)
+        refresh_event_settlement(events)
 
         return instance
 
@@ -175,10 +184,26 @@ class BankSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bank
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user', 'company')
 
 class CostCenterSerializer(serializers.ModelSerializer):
     class Meta:
         model = CostCenter
         fields = '__all__'
         read_only_fields = ('user',)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report', 'params', 'status', 'content_type', 'row_count', 'duration_ms',
+            'error', 'created_at', 'started_at', 'finished_at', 'download_url'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != "concluido":
+            return None
+        return f"/payments/report/jobs/{obj.id}/download/"
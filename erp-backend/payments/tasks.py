@@ -5,13 +5,63 @@ from .models import Bill, Income
 @shared_task
 def update_overdue_status():
     """Updates all Bills and Incomes that are overdue and still 'Em Aberto'."""
-    
+    from .report_cache import bump_data_version_on_commit
+
     # Update overdue Bills
     overdue_bills = Bill.objects.filter(status='em aberto', date_due__lt=now().date())
+    company_ids = set(overdue_bills.values_list('company_id', flat=True).distinct())
     count_bills = overdue_bills.update(status='vencido')
 
     # Update overdue Incomes
     overdue_incomes = Income.objects.filter(status='em aberto', date_due__lt=now().date())
+    company_ids.update(overdue_incomes.values_list('company_id', flat=True).distinct())
     count_incomes = overdue_incomes.update(status='vencido')
 
+    # .update() não dispara post_save: invalida os relatórios das empresas afetadas
+    for company_id in company_ids:
+        bump_data_version_on_commit(company_id)
+
     return f"Updated {count_bills} overdue Bills and {count_incomes} overdue Incomes to 'Vencido'."
+
+
+@shared_task
+def snapshot_bank_balances():
+    """Stores yesterday's closing balance of every bank so opening balances stay a single lookup."""
+    from datetime import timedelta
+    from .models import Bank
+    from .ledger import take_snapshot
+
+    day = now().date() - timedelta(days=1)
+    bank_ids = list(Bank.all_objects.values_list("id", flat=True))
+    for bank_id in bank_ids:
+        take_snapshot(bank_id, day)
+
+    return f"Stored {len(bank_ids)} bank balance snapshots for {day}."
+
+
+@shared_task
+def run_report_job(job_id):
+    """Renders a queued ReportJob and stores the file under REPORT_JOBS_ROOT."""
+    from .report_jobs import run_job
+
+    job = run_job(job_id)
+    return f"Report job {job.id} finished with status '{job.status}' in {job.duration_ms} ms."
+
+
+@shared_task
+def purge_report_jobs():
+    """Deletes report jobs (and their files) older than REPORT_JOBS_MAX_AGE_DAYS."""
+    import os
+    from datetime import timedelta
+    from django.conf import settings
+    from .models import ReportJob
+
+    old_jobs = ReportJob.objects.filter(created_at__lt=now() - timedelta(days=settings.REPORT_JOBS_MAX_AGE_DAYS))
+    count = 0
+    for job in old_jobs:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.delete()
+        count += 1
+
+    return f"Deleted {count} old report jobs."
@@ -0,0 +1,55 @@
+from django.db.models import Count, OuterRef, Subquery
+
+
+def _most_used_company(related, field, company="company"):
+    """Company of most rows of `related` pointing (through `field`) to the outer row; ties go to the lowest id."""
+    return Subquery(
+        related.filter(**{field: OuterRef("pk")})
+        .exclude(**{company: None})
+        .order_by()
+        .values(company)
+        .annotate(rows=Count("pk"))
+        .order_by("-rows", company)
+        .values(company)[:1]
+    )
+
+
+def assign_companies(apps):
+    """
+    Fills the company of the clients, suppliers, banks and events that still have none,
+    from the rows that use them: incomes, bills, payments and event allocations (then the
+    legacy Income.event / Bill.event, then the event's client). A row used by several
+    companies goes to the one that uses it most.
+
+    Takes an app registry so the data migration can run it on the historical models.
+    Returns {model name: rows assigned}; rows nothing points to stay null.
+    """
+    Client = apps.get_model("clients", "Client")
+    Supplier = apps.get_model("clients", "Supplier")
+    Event = apps.get_model("events", "Event")
+    Bank = apps.get_model("payments", "Bank")
+    Bill = apps.get_model("payments", "Bill")
+    Income = apps.get_model("payments", "Income")
+    Payment = apps.get_model("payments", "Payment")
+    EventAllocation = apps.get_model("payments", "EventAllocation")
+
+    def fill(model, *sources):
+        # Cada fonte só preenche o que as anteriores deixaram null
+        before = model.objects.filter(company=None).count()
+        for company in sources:
+            model.objects.filter(company=None).update(company=company)
+        return before - model.objects.filter(company=None).count()
+
+    return {
+        "client": fill(Client, _most_used_company(Income.objects, "person")),
+        "supplier": fill(Supplier, _most_used_company(Bill.objects, "person")),
+        "bank": fill(Bank, _most_used_company(Payment.objects, "bank")),
+        # Eventos: rateios, depois os FKs antigos das contas, depois o cliente (já preenchido acima)
+        "event": fill(
+            Event,
+            _most_used_company(EventAllocation.objects, "event", company="accrual__company"),
+            _most_used_company(Income.objects, "event"),
+            _most_used_company(Bill.objects, "event"),
+            Subquery(Client.objects.filter(pk=OuterRef("client")).values("company")[:1]),
+        ),
+    }
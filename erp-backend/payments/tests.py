@@ -1,3 +1,1092 @@
-from django.test import TestCase
+import importlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from django.apps import apps
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import Company, User
+from accounts.tenant import company_cache
+from erp_backend.pagination import KeysetPagination
+from clients.models import Client, Supplier
+from events.models import Event
+from events.utils.settlement import refresh_event_settlement
+from .models import (
+    AccountAllocation, Bank, BankBalanceSnapshot, BankMovement, Bill, ChartAccount, EventAllocation, Income, Payment
+)
+from .bulk import bulk_create_accruals
+from .ledger import OPENING_BALANCE_DATE, balance_at, balance_before, record_movement, take_snapshot
+from .report_cache import data_version
+from .report_rows import open_accrual_rows, paid_payment_rows
+from .splits import from_cents, remaining_cents, split_cents, to_cents
+from .tasks import update_overdue_status
+from .totals import rebuild_accrual_totals, recompute_statuses
 
-# Create your tests here.
+
+class AccrualListQueryCountTests(TestCase):
+    """The bill and income lists run the same number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+
+        client = Client.objects.create(name="Cliente", user=cls.user, company=cls.company)
+        supplier = Supplier.objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        event = Event.objects.create(
+            user=cls.user, company=cls.company, event_name="Evento", type="outros", client=client,
+            date=date(2025, 1, 1), total_value=Decimal("1000.00"),
+        )
+        chart_account = ChartAccount.objects.create(code="1", description="Conta")
+
+        for i in range(60):
+            fields = dict(
+                user=cls.user, company=cls.company, description=f"Conta {i}",
+                date_due=date(2025, 1, 1) + timedelta(days=i), value=Decimal("100.00"),
+            )
+            for accrual in (
+                Bill.objects.create(person=supplier, **fields),
+                Income.objects.create(person=client, **fields),
+            ):
+                AccountAllocation.objects.create(accrual=accrual, chart_account=chart_account, value=accrual.value)
+                EventAllocation.objects.create(accrual=accrual, event=event, value=accrual.value)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # A empresa do X-Company-ID vem do cache do processo; carregada antes para não entrar na contagem
+        company_cache.invalidate()
+        company_cache.get(self.company.pk)
+
+    def get(self, url, page_size):
+        response = self.client.get(url, {"page_size": page_size}, HTTP_X_COMPANY_ID=str(self.company.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), page_size)
+
+    def test_bills_list(self):
+        # COUNT, página, rateios por evento e por conta contábil
+        for page_size in (10, 50):
+            with self.assertNumQueries(4):
+                self.get("/payments/bills/", page_size)
+
+    def test_incomes_list(self):
+        for page_size in (10, 50):
+            with self.assertNumQueries(4):
+                self.get("/payments/incomes/", page_size)
+
+
+# Sem cache de arquivo/banco nos testes; cada chamada gera o relatório de novo
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "report_versions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+})
+class ChartAccountBalanceQueryCountTests(TestCase):
+    """The chart account balance runs a fixed number of queries whatever the number of payments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        cls.client_person = Client.objects.create(name="Cliente", user=cls.user, company=cls.company)
+        cls.supplier = Supplier.objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        cls.bank = Bank.objects.create(name="Banco", balance=Decimal("0.00"), user=cls.user, company=cls.company)
+
+        revenue = ChartAccount.objects.create(code="1", description="Receitas")
+        expenses = ChartAccount.objects.create(code="2", description="Despesas")
+        cls.accounts = [
+            ChartAccount.objects.create(code=f"{root.code}0{i}", description=f"Conta {i}", parent=root)
+            for root in (revenue, expenses) for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        company_cache.invalidate()
+        company_cache.get(self.company.pk)
+
+    def add_payments(self, count):
+        for i in range(count):
+            fields = dict(
+                user=self.user, company=self.company, description=f"Conta {i}",
+                date_due=date(2025, 1, 1) + timedelta(days=i % 300), value=Decimal("90.00"),
+            )
+            bill = Bill.objects.create(person=self.supplier, **fields)
+            income = Income.objects.create(person=self.client_person, **fields)
+            for accrual, accounts in ((income, self.accounts[:3]), (bill, self.accounts[3:])):
+                for account in accounts:
+                    AccountAllocation.objects.create(accrual=accrual, chart_account=account, value=Decimal("30.00"))
+                Payment.objects.create(
+                    user=self.user, company=self.company, bank=self.bank, value=accrual.value,
+                    date=accrual.date_due, status="pago",
+                    bill=accrual if accrual is bill else None, income=accrual if accrual is income else None,
+                )
+
+    def get_report(self):
+        response = self.client.get(
+            "/payments/report/chartaccount/", {"date_min": "2025-01-01", "date_max": "2025-12-31"},
+            HTTP_X_COMPANY_ID=str(self.company.pk),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+    def test_queries_do_not_grow_with_payments(self):
+        # Totais por conta (lado bill e lado income) e o plano de contas
+        self.add_payments(5)
+        with self.assertNumQueries(3):
+            self.get_report()
+        self.add_payments(45)
+        with self.assertNumQueries(3):
+            self.get_report()
+
+    def children(self, rows, code):
+        return [child["code"] for row in rows if row["code"] == code for child in row["children"]]
+
+    def test_chart_account_list_is_one_query(self):
+        # A árvore sai das próprias linhas da lista, sem consulta à parte
+        with self.assertNumQueries(1):
+            response = self.client.get("/payments/chartaccounts/")
+        rows = response.json()
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(self.children(rows, "1"), ["100", "101", "102"])
+        self.assertEqual(self.children(rows, "100"), [])
+
+    def test_filtered_chart_account_list_brings_whole_subtrees(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/payments/chartaccounts/", {"search": "Receitas"})
+        self.assertEqual(self.children(response.json(), "1"), ["100", "101", "102"])
+        with self.assertNumQueries(1):
+            response = self.client.get("/payments/chartaccounts/", {"leaf_only": "true"})
+        self.assertEqual(len(response.json()), 6)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "payments-report-access"},
+    "report_versions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "payments-report-access"},
+})
+class PaymentsReportAccessTests(TestCase):
+    """The cross-company payments report only reads the companies the user is a member of."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u1", email="u1@example.com", cpf="1", password="p")
+        cls.owner = User.objects.create_user(username="u2", email="u2@example.com", cpf="2", password="p")
+        cls.company = Company.objects.create(name="C1")
+        cls.other_company = Company.objects.create(name="C2")
+        cls.company.members.add(cls.user, cls.owner)
+        cls.other_company.members.add(cls.owner)
+
+        for company in (cls.company, cls.other_company):
+            supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.owner, company=company)
+            Bill.objects.create(
+                user=cls.owner, company=company, person=supplier, description="Conta",
+                date_due=date(2025, 1, 10), value=Decimal("100.00"),
+            )
+
+    def setUp(self):
+        # Os caches locmem sobrevivem ao rollback de cada teste
+        for alias in ("reports", "report_versions"):
+            caches[alias].clear()
+
+    def get_report(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(
+            "/payments/report/", {"status": "em aberto", **params}, HTTP_X_COMPANY_ID=str(self.company.pk)
+        )
+
+    def test_other_company_is_forbidden(self):
+        response = self.get_report(self.user, company_id=self.other_company.pk)
+        self.assertEqual(response.status_code, 403)
+
+    def test_member_company(self):
+        response = self.get_report(self.user, company_id=self.company.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Report-Rows"], "1")
+
+    def test_without_company_id_reads_only_member_companies(self):
+        # Mesmos parâmetros e mesmo X-Company-ID: o cache não pode entregar o relatório de outro usuário
+        self.assertEqual(self.get_report(self.owner)["X-Report-Rows"], "2")
+        self.assertEqual(self.get_report(self.user)["X-Report-Rows"], "1")
+
+    def test_membership_change_invalidates_the_cache(self):
+        self.assertEqual(self.get_report(self.user)["X-Report-Rows"], "1")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_company.members.add(self.user)
+        self.assertEqual(self.get_report(self.user)["X-Report-Rows"], "2")
+
+
+class EventAllocationSumTests(TestCase):
+    """Several allocations of one accrual to the same event count summed in the report rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        company = Company.objects.create(name="A")
+        client = Client.all_objects.create(name="Cliente", user=user, company=company)
+        bank = Bank.all_objects.create(name="Banco", balance=Decimal("0.00"), user=user, company=company)
+        cls.event = Event.all_objects.create(
+            user=user, company=company, event_name="Evento", type="outros", client=client,
+            date=date(2025, 1, 1), total_value=Decimal("1000.00"),
+        )
+        cls.income = Income.objects.create(
+            user=user, company=company, person=client, description="Receita",
+            date_due=date(2025, 1, 10), value=Decimal("100.00"),
+        )
+        for value in ("30.00", "20.00"):
+            EventAllocation.objects.create(accrual=cls.income, event=cls.event, value=Decimal(value))
+        cls.payment = Payment.objects.create(
+            user=user, company=company, bank=bank, income=cls.income, value=Decimal("40.00"),
+            date=date(2025, 1, 10), status="pago",
+        )
+
+    def test_open_rows(self):
+        # O pagamento foi criado direto pelo ORM, sem add_payment_totals: nada pago ainda
+        rows = open_accrual_rows(Income.objects.filter(pk=self.income.pk), self.event.pk)
+        self.assertEqual([row["value"] for row in rows], [Decimal("50.00")])
+
+    def test_paid_rows(self):
+        _, incomes = paid_payment_rows(Payment.objects.filter(pk=self.payment.pk), self.event.pk)
+        self.assertEqual([row["value"] for row in incomes], [Decimal("20.00")])
+        self.assertEqual(self.payment.get_allocated_value_to_event(self.event.pk), Decimal("20.00"))
+
+
+class BankPaymentConcurrencyTests(TransactionTestCase):
+    """
+    Payments posted in parallel through the real request path (JWT authentication, tenant
+    middleware, PaymentViewSet) leave the bank balance, the ledger and the bill totals consistent.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        self.company = Company.objects.create(name="A")
+        self.company.members.add(self.user)
+        self.token = str(AccessToken.for_user(self.user))
+        supplier = Supplier.all_objects.create(name="Fornecedor", user=self.user, company=self.company)
+        self.bill = Bill.objects.create(
+            user=self.user, company=self.company, person=supplier, description="Conta",
+            date_due=date(2025, 1, 10), value=Decimal("1000.00"),
+        )
+        response = self.api().post("/payments/banks/", {"name": "Banco", "balance": "500.00"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.bank_id = response.json()["id"]
+
+    def api(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}", HTTP_X_COMPANY_ID=str(self.company.pk))
+        return client
+
+    def post_payments(self, count, threads):
+        payload = {
+            "bill_id": self.bill.pk, "bank": self.bank_id, "value": "1.00",
+            "date": "2025-01-10", "status": "pago", "doc_number": "stress",
+        }
+
+        def create_payment(_):
+            try:
+                response = self.api().post("/payments/payments/", payload, format="json")
+                return response.json()["id"] if response.status_code == 201 else None
+            finally:
+                # Cada thread tem a própria conexão
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return [pk for pk in pool.map(create_payment, range(count)) if pk]
+
+    def assert_consistent(self, paid):
+        bank = Bank.all_objects.get(pk=self.bank_id)
+        ledger = BankMovement.objects.filter(bank_id=self.bank_id).aggregate(total=Sum("value"))["total"]
+        self.bill.refresh_from_db()
+        self.assertEqual(bank.balance, Decimal("500.00") - paid)
+        self.assertEqual(ledger, bank.balance)
+        self.assertEqual(self.bill.paid_total, paid)
+        self.assertEqual(self.bill.status, "parcial" if paid else "em aberto")
+
+    def run_payments(self, count, threads):
+        created = self.post_payments(count, threads)
+        self.assertEqual(len(created), count)
+        self.assert_consistent(Decimal(count))
+
+        for pk in created:
+            self.assertEqual(self.api().delete(f"/payments/payments/{pk}/").status_code, 204)
+        self.assert_consistent(Decimal("0.00"))
+
+    def test_sequential_payments(self):
+        self.run_payments(10, threads=1)
+
+    @skipUnless(connection.vendor == "postgresql", "escritas concorrentes precisam do Postgres")
+    def test_concurrent_payments(self):
+        self.run_payments(100, threads=8)
+
+
+class BulkSettleTests(TestCase):
+    """marcar-pago-lote settles each scheduled payment once, with one bank movement per payment."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        client = Client.all_objects.create(name="Cliente", user=cls.user, company=cls.company)
+        supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        cls.bank = Bank.all_objects.create(name="Banco", balance=Decimal("1000.00"), user=cls.user, company=cls.company)
+        cls.event = Event.all_objects.create(
+            user=cls.user, company=cls.company, event_name="Evento", type="outros", client=client,
+            date=date(2025, 1, 1), total_value=Decimal("300.00"),
+        )
+        fields = dict(user=cls.user, company=cls.company, description="Conta", date_due=date(2025, 1, 10))
+        cls.bill = Bill.objects.create(person=supplier, value=Decimal("100.00"), **fields)
+        cls.income = Income.objects.create(person=client, value=Decimal("300.00"), **fields)
+        EventAllocation.objects.create(accrual=cls.income, event=cls.event, value=Decimal("300.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+        self.bill_payment = self.schedule(bill_id=self.bill.pk, value="100.00")
+        self.income_payment = self.schedule(income_id=self.income.pk, value="300.00")
+
+    def schedule(self, **fields):
+        payload = {"bank": self.bank.pk, "date": "2025-01-10", "status": "agendado", "doc_number": "1", **fields}
+        response = self.client.post("/payments/payments/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def settle(self, ids, settle_date="2025-02-01"):
+        return self.client.post("/payments/payments/marcar-pago-lote/", {"ids": ids, "date": settle_date}, format="json")
+
+    def test_duplicate_and_missing_ids(self):
+        response = self.settle([self.bill_payment, self.income_payment, self.bill_payment, 999999])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["settled"], 2)
+        results = response.json()["results"]
+        self.assertEqual([row["status"] for row in results], ["pago", "pago", "erro", "erro"])
+        self.assertEqual(results[2]["detail"], "Pagamento repetido no lote.")
+        self.assertEqual(results[3]["detail"], "Pagamento não encontrado.")
+
+    def test_one_bank_movement_per_payment(self):
+        self.settle([self.bill_payment, self.income_payment, self.bill_payment])
+
+        movements = BankMovement.objects.filter(payment_id__in=[self.bill_payment, self.income_payment])
+        self.assertEqual(
+            sorted(movements.values_list("payment_id", "value", "date")),
+            [
+                (self.bill_payment, Decimal("-100.00"), date(2025, 2, 1)),
+                (self.income_payment, Decimal("300.00"), date(2025, 2, 1)),
+            ],
+        )
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal("1200.00"))
+
+    def test_statuses_and_event_settlement(self):
+        self.assertEqual(Income.objects.get(pk=self.income.pk).status, "agendado")
+        self.settle([self.bill_payment, self.income_payment])
+
+        self.assertEqual(
+            set(Payment.objects.filter(pk__in=[self.bill_payment, self.income_payment]).values_list("status", "date")),
+            {("pago", date(2025, 2, 1))},
+        )
+        for accrual in (Bill.objects.get(pk=self.bill.pk), Income.objects.get(pk=self.income.pk)):
+            self.assertEqual((accrual.status, accrual.paid_total, accrual.scheduled_total), ("pago", accrual.value, 0))
+        event = Event.all_objects.get(pk=self.event.pk)
+        self.assertEqual((event.settlement_status, event.paid), ("quitado", True))
+
+    def test_already_paid_payment_is_not_settled_again(self):
+        self.settle([self.bill_payment])
+        response = self.settle([self.bill_payment])
+        self.assertEqual(response.json()["settled"], 0)
+        self.assertEqual(response.json()["results"][0]["detail"], "Este pagamento já está marcado como pago.")
+        self.assertEqual(BankMovement.objects.filter(payment_id=self.bill_payment).count(), 1)
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal("900.00"))
+
+    def test_invalid_request(self):
+        self.assertEqual(self.settle([self.bill_payment], settle_date="2025-02-30").status_code, 400)
+        self.assertEqual(self.settle("abc").status_code, 400)
+        self.assertEqual(self.settle([]).status_code, 400)
+
+
+class BulkCreateAccrualTests(TestCase):
+    """bills/bulk/ and incomes/bulk/ write the Accrual and the Bill/Income rows with batched INSERTs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        cls.client_person = Client.all_objects.create(name="Cliente", user=cls.user, company=cls.company)
+        cls.supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        cls.event = Event.all_objects.create(
+            user=cls.user, company=cls.company, event_name="Evento", type="outros", client=cls.client_person,
+            date=date(2025, 1, 1), total_value=Decimal("1000.00"),
+        )
+        cls.chart_account = ChartAccount.objects.create(code="1", description="Conta")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+
+    def item(self, person, description, value):
+        return {
+            "person": person.pk, "description": description, "date_due": "2025-01-10", "value": value,
+            "event_allocations": [{"event": self.event.pk, "value": value}],
+            "account_allocations": [{"chart_account": self.chart_account.pk, "value": value}],
+        }
+
+    def test_bills(self):
+        items = [self.item(self.supplier, f"Conta {i}", f"{i}0.00") for i in range(1, 4)]
+        items.insert(1, {"description": "Sem fornecedor"})
+        response = self.client.post("/payments/bills/bulk/", items, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()["created"], 3)
+        results = response.json()["results"]
+        self.assertEqual([row["index"] for row in results], [0, 1, 2, 3])
+        self.assertIn("errors", results[1])
+
+        # Ids na ordem da entrada, cada um com a sua linha em payments_bill
+        ids = [results[i]["id"] for i in (0, 2, 3)]
+        self.assertEqual(ids, sorted(ids))
+        bills = Bill.objects.in_bulk(ids)
+        self.assertEqual([bills[pk].description for pk in ids], ["Conta 1", "Conta 2", "Conta 3"])
+        self.assertEqual([bills[pk].value for pk in ids], [Decimal("10.00"), Decimal("20.00"), Decimal("30.00")])
+        self.assertTrue(all(bills[pk].person_id == self.supplier.pk for pk in ids))
+        self.assertTrue(all(bills[pk].company_id == self.company.pk for pk in ids))
+        self.assertFalse(Income.objects.filter(pk__in=ids).exists())
+
+        for model in (EventAllocation, AccountAllocation):
+            allocations = model.objects.filter(accrual_id__in=ids).order_by("accrual_id")
+            self.assertEqual(
+                list(allocations.values_list("accrual_id", "value")),
+                [(pk, bills[pk].value) for pk in ids],
+            )
+
+        listed = self.client.get("/payments/bills/", {"page_size": 10}).json()["results"]
+        self.assertEqual([row["id"] for row in listed], ids)
+
+    def test_incomes(self):
+        items = [self.item(self.client_person, f"Receita {i}", "50.00") for i in range(2)]
+        response = self.client.post("/payments/incomes/bulk/", items, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        ids = [row["id"] for row in response.json()["results"]]
+        incomes = Income.objects.in_bulk(ids)
+        self.assertEqual([incomes[pk].description for pk in ids], ["Receita 0", "Receita 1"])
+        self.assertTrue(all(incomes[pk].person_id == self.client_person.pk for pk in ids))
+
+    def test_all_invalid(self):
+        response = self.client.post("/payments/bills/bulk/", [{"description": "x"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bill.objects.exists())
+
+    def test_returns_objects_in_input_order(self):
+        items = [
+            {"person": self.supplier, "description": f"Conta {i}", "date_due": date(2025, 1, i + 1), "value": Decimal(i)}
+            for i in range(1, 6)
+        ]
+        created = bulk_create_accruals(Bill, items, user=self.user, company=self.company)
+
+        self.assertEqual([bill.description for bill in created], [item["description"] for item in items])
+        for bill in created:
+            self.assertFalse(bill._state.adding)
+            self.assertEqual(Bill.objects.get(pk=bill.pk).date_due, bill.date_due)
+
+
+class AllocationSyncTests(TestCase):
+    """PATCHing an accrual only touches the allocations that changed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        client = Client.all_objects.create(name="Cliente", user=cls.user, company=cls.company)
+        cls.events = [
+            Event.all_objects.create(
+                user=cls.user, company=cls.company, event_name=f"Evento {i}", type="outros", client=client,
+                date=date(2025, 1, 1), total_value=Decimal("60.00"),
+            )
+            for i in range(3)
+        ]
+        cls.chart_account = ChartAccount.objects.create(code="1", description="Conta")
+        cls.income = Income.objects.create(
+            user=cls.user, company=cls.company, person=client, description="Receita",
+            date_due=date(2025, 1, 10), value=Decimal("100.00"), paid_total=Decimal("100.00"), status="pago",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+        self.kept = EventAllocation.objects.create(accrual=self.income, event=self.events[0], value=Decimal("40.00"))
+        self.removed = EventAllocation.objects.create(accrual=self.income, event=self.events[1], value=Decimal("60.00"))
+        AccountAllocation.objects.create(accrual=self.income, chart_account=self.chart_account, value=Decimal("100.00"))
+
+    def patch(self, data):
+        response = self.client.patch(f"/payments/incomes/{self.income.pk}/", data, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def allocations(self):
+        allocations = EventAllocation.objects.filter(accrual=self.income).order_by("id")
+        return list(allocations.values_list("id", "event_id", "value"))
+
+    def test_patch_without_allocations_keeps_them(self):
+        before = self.allocations()
+        self.patch({"description": "Outra descrição"})
+        self.assertEqual(self.allocations(), before)
+        self.assertEqual(AccountAllocation.objects.filter(accrual=self.income).count(), 1)
+
+    def test_changed_set_updates_creates_and_deletes(self):
+        self.patch({"event_allocations": [
+            {"event": self.events[0].pk, "value": "50.00"},
+            {"event": self.events[2].pk, "value": "50.00"},
+        ]})
+
+        kept, created = self.allocations()
+        # Mesma linha atualizada, a do evento fora da lista apagada, uma nova para o evento novo
+        self.assertEqual(kept, (self.kept.pk, self.events[0].pk, Decimal("50.00")))
+        self.assertEqual(created[1:], (self.events[2].pk, Decimal("50.00")))
+        self.assertGreater(created[0], self.removed.pk)
+        self.assertFalse(EventAllocation.objects.filter(pk=self.removed.pk).exists())
+        # Rateios por conta não vieram no PATCH
+        self.assertEqual(AccountAllocation.objects.filter(accrual=self.income).count(), 1)
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        before = self.allocations()
+        with CaptureQueriesContext(connection) as queries:
+            self.patch({"event_allocations": [
+                {"event": self.events[0].pk, "value": "40.00"},
+                {"event": self.events[1].pk, "value": "60.00"},
+            ]})
+        self.assertEqual(self.allocations(), before)
+        table = EventAllocation._meta.db_table
+        writes = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith((f'INSERT INTO "{table}"', f'UPDATE "{table}"', f'DELETE FROM "{table}"'))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_empty_list_deletes_all(self):
+        self.patch({"event_allocations": []})
+        self.assertEqual(self.allocations(), [])
+
+    def test_settlement_of_events_before_and_after(self):
+        # Receita paga: 60,00 no evento 1 quitam o contrato de 60,00
+        refresh_event_settlement([event.pk for event in self.events])
+        self.assertEqual(Event.all_objects.get(pk=self.events[1].pk).settlement_status, "quitado")
+
+        self.patch({"event_allocations": [
+            {"event": self.events[0].pk, "value": "40.00"},
+            {"event": self.events[2].pk, "value": "60.00"},
+        ]})
+        statuses = Event.all_objects.order_by("id").values_list("settlement_status", flat=True)
+        self.assertEqual(list(statuses), ["parcial", "em aberto", "quitado"])
+
+
+class BankLedgerTests(TestCase):
+    """Opening entry of new banks and the opening/closing balances read from the ledger."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+
+    def create_bank(self, balance):
+        return Bank.all_objects.create(name="Banco", balance=Decimal(balance), user=self.user, company=self.company)
+
+    def test_bank_created_through_the_orm_gets_its_opening_entry(self):
+        bank = self.create_bank("250.00")
+        self.assertEqual(
+            list(BankMovement.objects.filter(bank=bank).values_list("kind", "date", "value")),
+            [("saldo inicial", OPENING_BALANCE_DATE, Decimal("250.00"))],
+        )
+        # Vale para qualquer data, mesmo as de pagamentos retroativos
+        self.assertEqual(balance_before(bank.id, date(1990, 1, 1)), Decimal("250.00"))
+
+        bank.name = "Outro nome"
+        bank.save()
+        self.assertEqual(BankMovement.objects.filter(bank=bank).count(), 1)
+
+    def test_bank_without_balance_has_no_opening_entry(self):
+        bank = self.create_bank("0.00")
+        self.assertFalse(BankMovement.objects.filter(bank=bank).exists())
+        self.assertEqual(balance_at(bank.id, date(2025, 1, 1)), Decimal("0.00"))
+
+    def test_balance_before_and_at(self):
+        bank = self.create_bank("100.00")
+        record_movement(bank.id, Decimal("50.00"), date(2025, 1, 10))
+        record_movement(bank.id, Decimal("-30.00"), date(2025, 1, 20))
+
+        self.assertEqual(balance_before(bank.id, date(2025, 1, 10)), Decimal("100.00"))
+        self.assertEqual(balance_at(bank.id, date(2025, 1, 10)), Decimal("150.00"))
+        self.assertEqual(balance_before(bank.id, date(2025, 1, 20)), Decimal("150.00"))
+        self.assertEqual(balance_at(bank.id, date(2025, 1, 31)), Decimal("120.00"))
+
+    def test_snapshots(self):
+        bank = self.create_bank("100.00")
+        record_movement(bank.id, Decimal("50.00"), date(2025, 1, 10))
+        self.assertEqual(take_snapshot(bank.id, date(2025, 1, 15)), Decimal("150.00"))
+
+        # Movimento retroativo desloca o fechamento já gravado; o posterior entra pelo delta
+        record_movement(bank.id, Decimal("-20.00"), date(2025, 1, 5))
+        record_movement(bank.id, Decimal("10.00"), date(2025, 1, 20))
+        self.assertEqual(BankBalanceSnapshot.objects.get(bank=bank).balance, Decimal("130.00"))
+        self.assertEqual(balance_before(bank.id, date(2025, 1, 10)), Decimal("80.00"))
+        self.assertEqual(balance_at(bank.id, date(2025, 1, 15)), Decimal("130.00"))
+        self.assertEqual(balance_at(bank.id, date(2025, 1, 20)), Decimal("140.00"))
+
+    def test_migration_seeds_missing_opening_entries(self):
+        seed = importlib.import_module("payments.migrations.0040_seed_opening_balances").seed_opening_balances
+
+        # Banco antigo: sem saldo inicial no livro, só um pagamento e um fechamento
+        legacy = self.create_bank("500.00")
+        BankMovement.objects.filter(bank=legacy).delete()
+        record_movement(legacy.id, Decimal("-100.00"), date(2025, 1, 10))
+        take_snapshot(legacy.id, date(2025, 1, 10))
+        seeded = self.create_bank("70.00")
+
+        seed(apps, None)
+        seed(apps, None)
+
+        openings = BankMovement.objects.filter(bank=legacy, kind="saldo inicial")
+        self.assertEqual(list(openings.values_list("date", "value")), [(OPENING_BALANCE_DATE, Decimal("600.00"))])
+        self.assertEqual(balance_at(legacy.id, date(2025, 1, 10)), Decimal("500.00"))
+        self.assertEqual(BankBalanceSnapshot.objects.get(bank=legacy).balance, Decimal("500.00"))
+        self.assertEqual(BankMovement.objects.filter(bank=seeded).count(), 1)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    "report_versions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+})
+class BankStatementTests(TestCase):
+    """The bank statement opens with the ledger balance and streams the running balance per line."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        cls.bank = Bank.all_objects.create(name="Banco", balance=Decimal("1000.00"), user=cls.user, company=cls.company)
+        client = Client.all_objects.create(name="Cliente", user=cls.user, company=cls.company)
+        supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        fields = dict(user=cls.user, company=cls.company, date_due=date(2025, 1, 1), value=Decimal("1000.00"))
+        cls.bill = Bill.objects.create(person=supplier, description="Aluguel", **fields)
+        cls.income = Income.objects.create(person=client, description="Contrato", **fields)
+
+        # Pagamento de outra empresa no mesmo período: fica fora do extrato consolidado
+        other = Company.objects.create(name="B")
+        other_bank = Bank.all_objects.create(name="Outro", balance=Decimal("0.00"), user=cls.user, company=other)
+        other_bill = Bill.objects.create(
+            person=Supplier.all_objects.create(name="F", user=cls.user, company=other),
+            description="Outra", user=cls.user, company=other, date_due=date(2025, 1, 1), value=Decimal("10.00"),
+        )
+        Payment.objects.create(
+            user=cls.user, company=other, bank=other_bank, bill=other_bill, value=Decimal("10.00"),
+            date=date(2025, 1, 10), status="pago",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+        for accrual, value, day, status in (
+            (self.income, "200.00", "2025-01-05", "pago"),   # antes do período: entra no saldo inicial
+            (self.bill, "50.00", "2025-01-10", "pago"),
+            (self.income, "300.00", "2025-01-12", "pago"),
+            (self.bill, "30.00", "2025-01-15", "agendado"),  # agendado não movimenta o banco
+            (self.bill, "20.00", "2025-02-10", "pago"),      # depois do período
+        ):
+            field = "bill_id" if accrual is self.bill else "income_id"
+            payload = {field: accrual.pk, "bank": self.bank.pk, "value": value, "date": day, "status": status}
+            response = self.client.post("/payments/payments/", payload, format="json")
+            self.assertEqual(response.status_code, 201)
+
+    def statement(self, **params):
+        return self.client.get("/payments/report/bank/", {"date_min": "2025-01-08", "date_max": "2025-01-31", **params})
+
+    def test_json_statement(self):
+        response = self.statement(bank_id=self.bank.pk, output="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual(data["bank"], "Banco")
+        self.assertEqual(Decimal(data["saldo_inicial"]), Decimal("1200.00"))
+        lines = [(line["date"], line["descricao"], Decimal(line["value"]), Decimal(line["balance"])) for line in data["lines"]]
+        self.assertEqual(
+            lines,
+            [
+                ("2025-01-10", "Aluguel", Decimal("-50.00"), Decimal("1150.00")),
+                ("2025-01-12", "Contrato", Decimal("300.00"), Decimal("1450.00")),
+            ],
+        )
+
+    def test_consolidated_statement_reads_only_the_company_banks(self):
+        data = json.loads(b"".join(self.statement(output="json").streaming_content))
+        self.assertEqual(data["bank"], "Consolidado")
+        self.assertEqual(Decimal(data["saldo_inicial"]), Decimal("1200.00"))
+        self.assertEqual(len(data["lines"]), 2)
+
+    def test_empty_period(self):
+        response = self.statement(date_min="2025-03-01", date_max="2025-03-31", output="json")
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual((Decimal(data["saldo_inicial"]), data["lines"]), (Decimal("1430.00"), []))
+
+    def test_pdf_statement(self):
+        response = self.statement(bank_id=self.bank.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["X-Report-Rows"], "2")
+
+
+class AccrualPaymentTestCase(TestCase):
+    """Two bills of one company, paid through the payments API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        cls.bank = Bank.all_objects.create(name="Banco", balance=Decimal("1000.00"), user=cls.user, company=cls.company)
+        fields = dict(user=cls.user, company=cls.company, person=supplier, description="Conta", date_due=date(2025, 1, 10))
+        cls.bill = Bill.objects.create(value=Decimal("100.00"), **fields)
+        cls.other_bill = Bill.objects.create(value=Decimal("200.00"), **fields)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+
+    def pay(self, value, status="pago", bill=None):
+        payload = {
+            "bank": self.bank.pk, "date": "2025-01-10", "status": status, "doc_number": "1",
+            "bill_id": (bill or self.bill).pk, "value": value,
+        }
+        response = self.client.post("/payments/payments/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+
+
+class AccrualTotalsTests(AccrualPaymentTestCase):
+    """paid_total / scheduled_total follow every payment write, as if rebuilt from the payments."""
+
+    def totals(self, bill=None):
+        bill = Bill.objects.get(pk=(bill or self.bill).pk)
+        return bill.paid_total, bill.scheduled_total
+
+    def assertTotalsMatchPayments(self):
+        stored = sorted(Bill.objects.values_list("pk", "paid_total", "scheduled_total"))
+        rebuild_accrual_totals()
+        self.assertEqual(sorted(Bill.objects.values_list("pk", "paid_total", "scheduled_total")), stored)
+
+    def test_create(self):
+        self.pay("30.00")
+        self.pay("20.00", status="agendado")
+        self.assertEqual(self.totals(), (Decimal("30.00"), Decimal("20.00")))
+        self.assertTotalsMatchPayments()
+
+    def test_update_value_and_status(self):
+        payment = self.pay("30.00")
+        self.client.patch(f"/payments/payments/{payment}/", {"value": "45.00"}, format="json")
+        self.assertEqual(self.totals(), (Decimal("45.00"), Decimal("0.00")))
+        self.client.patch(f"/payments/payments/{payment}/", {"status": "agendado"}, format="json")
+        self.assertEqual(self.totals(), (Decimal("0.00"), Decimal("45.00")))
+        self.assertTotalsMatchPayments()
+
+    def test_update_moves_payment_to_another_accrual(self):
+        payment = self.pay("30.00")
+        response = self.client.patch(f"/payments/payments/{payment}/", {"bill_id": self.other_bill.pk}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self.totals(self.other_bill), (Decimal("30.00"), Decimal("0.00")))
+        self.assertTotalsMatchPayments()
+
+    def test_delete(self):
+        paid = self.pay("30.00")
+        scheduled = self.pay("20.00", status="agendado")
+        self.assertEqual(self.client.delete(f"/payments/payments/{paid}/").status_code, 204)
+        self.assertEqual(self.totals(), (Decimal("0.00"), Decimal("20.00")))
+        self.assertEqual(self.client.delete(f"/payments/payments/{scheduled}/").status_code, 204)
+        self.assertEqual(self.totals(), (Decimal("0.00"), Decimal("0.00")))
+
+    def test_marcar_pago_moves_value_from_scheduled_to_paid(self):
+        payment = self.pay("20.00", status="agendado")
+        response = self.client.patch(f"/payments/payments/{payment}/marcar-pago/", {"date": "2025-02-01"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), (Decimal("20.00"), Decimal("0.00")))
+        self.assertTotalsMatchPayments()
+
+
+class AccrualStatusTests(AccrualPaymentTestCase):
+    """The accrual status follows its stored paid_total on every payment write."""
+
+    def status(self, bill=None):
+        return Bill.objects.get(pk=(bill or self.bill).pk).status
+
+    def test_create(self):
+        self.pay("30.00")
+        self.assertEqual(self.status(), "parcial")
+        self.pay("70.00")
+        self.assertEqual(self.status(), "pago")
+
+    def test_scheduled_payment_marks_accrual_as_scheduled(self):
+        self.pay("100.00", status="agendado")
+        self.assertEqual(self.status(), "agendado")
+
+    def test_update(self):
+        payment = self.pay("30.00")
+        self.client.patch(f"/payments/payments/{payment}/", {"value": "100.00"}, format="json")
+        self.assertEqual(self.status(), "pago")
+        self.client.patch(f"/payments/payments/{payment}/", {"value": "99.99"}, format="json")
+        self.assertEqual(self.status(), "parcial")
+
+    def test_update_moves_payment_to_another_accrual(self):
+        payment = self.pay("100.00")
+        self.client.patch(f"/payments/payments/{payment}/", {"bill_id": self.other_bill.pk}, format="json")
+        self.assertEqual(self.status(), "em aberto")
+        self.assertEqual(self.status(self.other_bill), "parcial")
+
+    def test_delete(self):
+        payment = self.pay("100.00")
+        self.client.delete(f"/payments/payments/{payment}/")
+        self.assertEqual(self.status(), "em aberto")
+
+    def test_marcar_pago(self):
+        payment = self.pay("100.00", status="agendado")
+        self.client.patch(f"/payments/payments/{payment}/marcar-pago/", {"date": "2025-02-01"}, format="json")
+        self.assertEqual(self.status(), "pago")
+
+    def test_status_expression(self):
+        Bill.objects.filter(pk=self.bill.pk).update(paid_total=Decimal("100.004"))
+        Bill.objects.filter(pk=self.other_bill.pk).update(value=Decimal("0.00"))
+        recompute_statuses([self.bill.pk, self.other_bill.pk])
+        # Diferença abaixo de um centavo é quitação; conta de valor zero já nasce paga
+        self.assertEqual((self.status(), self.status(self.other_bill)), ("pago", "pago"))
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "report-cache-invalidation"},
+    "report_versions": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "report-cache-invalidation"},
+})
+class ReportCacheInvalidationTests(TestCase):
+    """Every write path, signal-driven or bulk UPDATE, bumps the company version and the cached report changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        cls.supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        cls.bank = Bank.all_objects.create(name="Banco", balance=Decimal("0.00"), user=cls.user, company=cls.company)
+        cls.bill = Bill.objects.create(
+            user=cls.user, company=cls.company, person=cls.supplier, description="Conta",
+            date_due=date(2025, 1, 10), value=Decimal("100.00"),
+        )
+
+    def setUp(self):
+        # Os caches locmem sobrevivem ao rollback de cada teste
+        for alias in ("reports", "report_versions"):
+            caches[alias].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+
+    def report_rows(self, url="/payments/report/", **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Report-Rows"]
+
+    def assertInvalidates(self, write, before, after, **params):
+        """Caches the report, runs `write` (committing it) and checks the version and the report changed."""
+        self.assertEqual(self.report_rows(**params), before)
+        version = data_version(self.company.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(data_version(self.company.pk), version)
+        self.assertEqual(self.report_rows(**params), after)
+
+    def payment(self, status, value):
+        return Payment.objects.create(
+            user=self.user, company=self.company, bank=self.bank, bill=self.bill,
+            value=Decimal(value), date=date(2025, 1, 10), status=status, description="Pagamento",
+        )
+
+    def test_report_is_served_from_the_cache_until_a_write(self):
+        self.assertEqual(self.report_rows(status="em aberto"), "1")
+        # Sem commit não há invalidação: o relatório continua o do cache
+        with self.captureOnCommitCallbacks(execute=False):
+            Bill.objects.filter(pk=self.bill.pk).update(value=Decimal("0.00"))
+        self.assertEqual(self.report_rows(status="em aberto"), "1")
+
+    def test_payment_save(self):
+        self.assertInvalidates(lambda: self.payment("pago", "100.00"), "0", "1", status="pago")
+
+    def test_recompute_statuses(self):
+        self.assertEqual(self.report_rows(status="em aberto"), "1")
+        with self.captureOnCommitCallbacks(execute=False):
+            self.payment("pago", "100.00")
+        self.assertInvalidates(
+            lambda: recompute_statuses([self.bill.pk], refresh_totals=True), "1", "0", status="em aberto"
+        )
+
+    def test_bulk_create_accruals(self):
+        item = {"person": self.supplier, "description": "Outra", "date_due": date(2025, 1, 20), "value": Decimal("50.00")}
+        self.assertInvalidates(
+            lambda: bulk_create_accruals(Bill, [item], user=self.user, company=self.company),
+            "1", "2", status="em aberto",
+        )
+
+    def test_update_overdue_status(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.payment("agendado", "40.00")
+        # Centro de custo "em aberto" só lê contas em aberto/parciais; vencida sai do relatório
+        self.assertInvalidates(
+            update_overdue_status, "1", "0", url="/payments/report/costcenter/", type="bills", status="em_aberto"
+        )
+
+
+def decimal_split(paid, allocated, total):
+    # Conta por linha que os relatórios faziam antes de splits.py
+    ratio = allocated / total if total else 0
+    return round(paid * ratio, 2)
+
+
+def decimal_remaining(allocated, paid_total, total):
+    ratio = allocated / total if total else 0
+    return round(allocated - paid_total * ratio, 2)
+
+
+class SplitCentsTests(SimpleTestCase):
+    """split_cents / remaining_cents match the per-row Decimal arithmetic to the cent."""
+
+    CASES = [
+        # Empates exatos de meio centavo (half-even)
+        ("0.01", "50.00", "100.00"),
+        ("0.03", "50.00", "100.00"),
+        ("1.05", "50.00", "100.00"),
+        # Empate exato com razão dízima: o Decimal arredonda a razão antes e sai do empate
+        ("0.03", "1.00", "6.00"),
+        ("0.09", "1.00", "6.00"),
+        ("100.00", "1.00", "3.00"),
+        # Total zero
+        ("10.00", "5.00", "0.00"),
+        ("0.00", "0.00", "0.00"),
+        # Negativos
+        ("-10.05", "50.00", "100.00"),
+        ("10.00", "-1.00", "3.00"),
+        ("10.00", "1.00", "-3.00"),
+        ("-0.03", "1.00", "-6.00"),
+        ("-1.05", "-50.00", "-100.00"),
+    ]
+    GRID = ["-7.77", "-0.05", "0.00", "0.01", "0.03", "0.50", "1.00", "2.50", "3.00", "99.99"]
+
+    def cases(self):
+        cases = [tuple(Decimal(v) for v in case) for case in self.CASES]
+        cases += [
+            (Decimal(a), Decimal(b), Decimal(c))
+            for a in self.GRID for b in self.GRID for c in self.GRID
+        ]
+        return cases
+
+    def test_split_cents(self):
+        cases = self.cases()
+        result = split_cents(*[[to_cents(case[i]) for case in cases] for i in range(3)])
+        for case, value in zip(cases, result):
+            self.assertEqual(from_cents(value), decimal_split(*case), case)
+
+    def test_remaining_cents(self):
+        cases = [(allocated, paid, total) for paid, allocated, total in self.cases()]
+        result = remaining_cents(*[[to_cents(case[i]) for case in cases] for i in range(3)])
+        for case, value in zip(cases, result):
+            self.assertEqual(from_cents(value), decimal_remaining(*case), case)
+
+    def test_large_values_do_not_overflow(self):
+        case = (Decimal("9999999999.99"), Decimal("3333333333.33"), Decimal("9999999999.99"))
+        self.assertEqual(from_cents(split_cents(*[[to_cents(v)] for v in case])[0]), decimal_split(*case))
+
+
+class KeysetPaginationTests(TestCase):
+    """?pagination=cursor walks the list by (date_due, id) without repeating or skipping rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="u", email="u@example.com", cpf="1", password="p")
+        cls.company = Company.objects.create(name="A")
+        cls.company.members.add(cls.user)
+        supplier = Supplier.all_objects.create(name="Fornecedor", user=cls.user, company=cls.company)
+        # Vários vencimentos iguais: o id desempata
+        due_dates = [date(2025, 1, 10)] * 4 + [date(2025, 1, 5)] * 2 + [date(2025, 1, 20)]
+        cls.bills = [
+            Bill.objects.create(
+                user=cls.user, company=cls.company, person=supplier, description=f"Conta {i}",
+                date_due=due, value=Decimal("10.00"),
+            )
+            for i, due in enumerate(due_dates)
+        ]
+        cls.expected = [bill.pk for bill in sorted(cls.bills, key=lambda bill: (bill.date_due, bill.pk))]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.credentials(HTTP_X_COMPANY_ID=str(self.company.pk))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [row["id"] for row in page["results"]]
+
+    def test_cursor_round_trip(self):
+        page = self.get("/payments/bills/", pagination="cursor", page_size=3)
+        self.assertIsNone(page["previous"])
+        pages = [page]
+        while page["next"]:
+            page = self.get(page["next"])
+            pages.append(page)
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.expected)
+        self.assertEqual([len(self.ids(page)) for page in pages], [3, 3, 1])
+
+        # Voltando pelos links "previous" as páginas se repetem iguais
+        for previous in reversed(pages[:-1]):
+            page = self.get(page["previous"])
+            self.assertEqual(self.ids(page), self.ids(previous))
+        self.assertIsNone(page["previous"])
+
+    def test_ties_on_the_sort_key_break_by_id(self):
+        # Página termina no meio dos vencimentos iguais a 10/01
+        first = self.get("/payments/bills/", pagination="cursor", page_size=4)
+        second = self.get(first["next"])
+        self.assertEqual(self.ids(first) + self.ids(second), self.expected)
+
+    def test_count_only_when_asked(self):
+        self.assertNotIn("count", self.get("/payments/bills/", pagination="cursor"))
+        page = self.get("/payments/bills/", pagination="cursor", page_size=2, count=1)
+        self.assertEqual(page["count"], len(self.bills))
+        self.assertEqual(self.get(page["next"])["count"], len(self.bills))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/payments/bills/", {"cursor": "abc"}).status_code, 404)
+
+    def test_ordering_across_relations_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            KeysetPagination().get_ordering(Bill.objects.order_by("person__name"))
+        self.assertEqual(KeysetPagination().get_ordering(Bill.objects.order_by("-date_due")), ["-date_due", "-id"])
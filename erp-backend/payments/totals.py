@@ -0,0 +1,82 @@
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, Func, OuterRef, Q, QuerySet, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.db.models.lookups import Exact
+from .models import Accrual, Payment
+from .report_cache import bump_data_version_on_commit
+from events.utils.settlement import events_of_accruals, refresh_event_settlement
+
+# Coluna de Accrual que acumula os pagamentos de cada status
+TOTAL_BY_STATUS = {
+    "pago": "paid_total",
+    "agendado": "scheduled_total",
+}
+
+
+def add_payment_totals(payment, sign=1):
+    """Adds (sign=1) or removes (sign=-1) a payment from its accrual's stored totals."""
+    accrual_id = payment.bill_id or payment.income_id
+    field = TOTAL_BY_STATUS.get(payment.status)
+    if not accrual_id or not field or not payment.value:
+        return
+    Accrual.objects.filter(pk=accrual_id).update(**{field: F(field) + sign * payment.value})
+
+
+def status_expression():
+    """
+    Status implied by the stored paid_total: pago when it covers the value (or the value is 0),
+    parcial when something was paid, em aberto otherwise.
+    """
+    return Case(
+        When(value=0, then=Value("pago")),
+        # Valores em centavos: |pago - valor| < 0,01 é a diferença arredondada ser zero
+        When(Exact(Round(F("paid_total") - F("value"), 2), 0), then=Value("pago")),
+        When(paid_total__gt=0, then=Value("parcial")),
+        default=Value("em aberto"),
+    )
+
+
+def recompute_statuses(accruals, refresh_totals=False):
+    """
+    Recomputes the status of many accruals in one UPDATE; with refresh_totals the stored
+    totals are rebuilt from the payments first (one more UPDATE). The settlement of the
+    events they are allocated to follows (one more UPDATE).
+
+    `accruals` is an Accrual queryset or an iterable of accrual ids. Every bulk payment
+    operation should call this once for all the accruals it touched. Returns the number of accruals.
+    """
+    if not isinstance(accruals, QuerySet):
+        accrual_ids = {pk for pk in accruals if pk}
+        if not accrual_ids:
+            return 0
+        accruals = Accrual.objects.filter(pk__in=accrual_ids)
+
+    if refresh_totals:
+        rebuild_accrual_totals(accruals)
+    count = accruals.update(status=status_expression())
+    # O recebido dos eventos vem do paid_total das receitas rateadas
+    refresh_event_settlement(events_of_accruals(accruals.values("pk")))
+
+    # UPDATE não dispara post_save, então o cache dos relatórios é invalidado aqui
+    for company_id in set(accruals.values_list("company_id", flat=True)):
+        bump_data_version_on_commit(company_id)
+    return count
+
+
+def payments_total_subquery(status):
+    payments = (
+        Payment.objects.filter(Q(bill_id=OuterRef("pk")) | Q(income_id=OuterRef("pk")), status=status)
+        .order_by()
+        .annotate(total=Func(F("value"), function="SUM"))
+        .values("total")
+    )
+    money = DecimalField(max_digits=12, decimal_places=2)
+    return Coalesce(Subquery(payments, output_field=money), Value(Decimal("0.00")), output_field=money)
+
+
+def rebuild_accrual_totals(accruals=None):
+    """Recomputes the stored totals from the payments in one UPDATE. Returns the number of accruals."""
+    accruals = Accrual.objects.all() if accruals is None else accruals
+    return accruals.update(**{
+        field: payments_total_subquery(status) for status, field in TOTAL_BY_STATUS.items()
+    })
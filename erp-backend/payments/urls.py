@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import BillViewSet, generate_scheduled_payments_report, IncomeViewSet, BankViewSet, generate_chartaccount_summary_report, generate_quadro_realizado_report, generate_quadro_espelho_report, combined_extract, PaymentViewSet, generate_bank_statement_report, generate_chart_account_balance, generate_payments_report, generate_cost_center_consolidated_report, CostCenterViewSet, event_accruals_view, ChartAccountViewSet
+from .views import BillViewSet, generate_scheduled_payments_report, IncomeViewSet, BankViewSet, generate_chartaccount_summary_report, generate_quadro_realizado_report, generate_quadro_espelho_report, combined_extract, PaymentViewSet, generate_bank_statement_report, generate_chart_account_balance, generate_payments_report, generate_cost_center_consolidated_report, CostCenterViewSet, event_accruals_view, ChartAccountViewSet, submit_report_job, report_job_status, download_report_job, report_cache_stats
 from django.urls import path, include
 
 router = DefaultRouter()
@@ -21,6 +21,10 @@ urlpatterns = [
     path("report/bank/", generate_bank_statement_report),
     path("report/espelho/", generate_quadro_espelho_report),
     path("report/realizado/", generate_quadro_realizado_report),
-    path("report/agendado/", generate_scheduled_payments_report)
+    path("report/agendado/", generate_scheduled_payments_report),
+    path("report/cache/", report_cache_stats),
+    path("report/jobs/", submit_report_job),
+    path("report/jobs/<uuid:job_id>/", report_job_status),
+    path("report/jobs/<uuid:job_id>/download/", download_report_job),
     
 ]
@@ -3,32 +3,51 @@ from rest_framework.decorators import api_view, permission_classes  # type: igno
 from rest_framework.response import Response  # type: ignore
 from rest_framework.permissions import IsAuthenticated  # type: ignore
 from django.db import transaction, models # type: ignore
-from django.db.models import Q # type: ignore
-from .models import Bill, Income, Bank, Payment, CostCenter, EventAllocation, ChartAccount
+from django.db.models import Q, F, Sum, Case, When, Window, Prefetch # type: ignore
+from django.db.models.functions import Coalesce
+from .models import Bill, Income, Bank, Payment, CostCenter, EventAllocation, AccountAllocation, ChartAccount, ReportJob
 from django.contrib.contenttypes.models import ContentType
-from .serializers import BillSerializer, IncomeSerializer, BankSerializer, PaymentSerializer, CostCenterSerializer, ChartAccountSerializer
+from .serializers import BillSerializer, IncomeSerializer, BankSerializer, PaymentSerializer, CostCenterSerializer, ChartAccountSerializer, ReportJobSerializer
+from .aggregations import chart_account_totals, chart_group_totals, cost_center_totals, rollup_chart_accounts
+from .splits import payment_frame, allocation_frame, split_payments, from_cents
+from .report_rows import open_accrual_rows, paid_payment_rows
+from .totals import add_payment_totals, recompute_statuses
+from .bulk import bulk_create_accruals
+from .ledger import (
+    record_movement, record_payment_movement, balance_before, payment_signed_value,
+    apply_payment, shift_balances, record_payment_movements,
+)
+from .report_jobs import REPORTS
+from .report_cache import cached_report, cache_stats
+from .tasks import run_report_job
 from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.core.serializers.json import DjangoJSONEncoder
 from reportlab.lib.pagesizes import landscape, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.lib.colors import red, blue, black
 from events.utils.pdffunctions import draw_header, draw_rows, check_page_break, truncate_text
 from accounts.utils import get_company_or_404
+from accounts.tenant import parse_company_id
 from accounts.models import Company
 from events.models import Event
+from events.utils.settlement import refresh_event_settlement
 from datetime import datetime
 from collections import defaultdict
 from functools import reduce
 from decimal import Decimal, ROUND_HALF_UP
 import logging
-from rest_framework.pagination import PageNumberPagination
+import json
+from erp_backend.pagination import StandardResultsSetPagination
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as drf_status
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 def safe_decimal(value):
@@ -43,14 +62,10 @@ except:
 def format_currency(value: Decimal) -> str:
     return locale.currency(value, grouping=True)
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+# Linhas buscadas por vez no cursor do extrato bancário
+STATEMENT_CHUNK_SIZE = 2000
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def generate_bank_statement_report(request):
+def build_bank_statement_report(company, params, user):
     from django.utils import timezone
 
     def shorten_text(text, max_width, canvas, font_name="Helvetica", font_size=9):
@@ -62,74 +77,71 @@ def generate_bank_statement_report(request):
             return text.strip() + "..."
         return text
 
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    bank_id = request.query_params.get("bank_id")
-    user = request.user
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
+    bank_id = params.get("bank_id")
 
-    company = get_company_or_404(request)
 
-    # 🔵 1. Obter saldo atual do banco
+    # 🔵 1. Saldo de abertura em date_min a partir do livro de movimentos (snapshot + delta)
     if bank_id:
-        bank = Bank.objects.get(id=bank_id)
-        saldo_atual = bank.balance
+        bank = get_object_or_404(Bank, id=bank_id)
+        bank_ids = [bank.id]
         bank_name = bank.name
     else:
-        saldo_atual = sum(bank.balance for bank in Bank.objects.all())
+        bank_ids = list(Bank.objects.values_list("id", flat=True))
         bank_name = "Consolidado"
 
-    # 🔵 2. Obter todos os pagamentos até date_min
-    payments_range = Payment.objects.filter(date__gte=date_min, status="pago")
-    if bank_id:
-        payments_range = payments_range.filter(bank_id=bank_id)
-
-    payments_range = payments_range.select_related('bill__person', 'income__person').order_by('-date', '-id')  # do mais recente ao mais antigo
+    saldo_inicial = sum((balance_before(b, date_min) for b in bank_ids), Decimal("0.00"))
 
-    saldo = saldo_atual
-    for p in payments_range:
-        if p.bill:
-            saldo += p.value  # desfaz o pagamento
-        elif p.income:
-            saldo -= p.value  # desfaz o recebimento
-
-    saldo_inicial = saldo
-
-    # 🔵 3. Filtrar apenas os pagamentos do período solicitado (para mostrar no extrato)
-    payments = Payment.objects.filter(date__gte=date_min, status="pago")
+    # 🔵 2. Filtrar apenas os pagamentos do período solicitado (para mostrar no extrato)
+    # (só dos bancos da empresa: os mesmos do saldo inicial, no JSON e no PDF)
+    payments = Payment.objects.filter(date__gte=date_min, status="pago", bank_id__in=bank_ids).filter(
+        Q(bill__isnull=False) | Q(income__isnull=False)
+    )
     if date_max:
         payments = payments.filter(date__lte=date_max)
-    if bank_id:
-        payments = payments.filter(bank_id=bank_id)
 
-    payments = payments.select_related('bill__person', 'income__person').order_by("date", "id")
+    # 🔵 3. Montar extrato: o saldo acumulado vem do banco (SUM() OVER) e as linhas
+    # chegam por cursor do lado do servidor, sem montar a lista inteira em memória
+    signed_value = Case(
+        When(bill__isnull=False, then=-F("value")),
+        default=F("value"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    rows = (
+        payments.annotate(signed_value=signed_value)
+        .annotate(running=Window(Sum("signed_value"), order_by=[F("date").asc(), F("id").asc()]))
+        .order_by("date", "id")
+        .values(
+            "id", "date", "signed_value", "running",
+            favorecido=Coalesce("bill__person__name", "income__person__name"),
+            descricao=Coalesce("bill__description", "income__description"),
+        )
+    )
 
-    # 🔵 4. Montar extrato
-    balance_moving = saldo_inicial
-    lines = []
-    for p in payments:
-        if p.bill:
-            favorecido = p.bill.person.name if p.bill.person else "-"
-            descricao = p.bill.description
-            balance_moving -= p.value
-            value_display = -p.value
-        elif p.income:
-            favorecido = p.income.person.name if p.income.person else "-"
-            descricao = p.income.description
-            balance_moving += p.value
-            value_display = p.value
-        else:
-            continue
+    def statement_lines():
+        for row in rows.iterator(chunk_size=STATEMENT_CHUNK_SIZE):
+            yield {
+                "date": row["date"],
+                "id": row["id"],
+                "favorecido": row["favorecido"] or "-",
+                "descricao": row["descricao"],
+                "value": row["signed_value"],
+                "balance": saldo_inicial + row["running"],
+            }
 
-        lines.append({
-            "date": p.date,
-            "id": p.id,
-            "favorecido": favorecido,
-            "descricao": descricao,
-            "value": value_display,
-            "balance": balance_moving
-        })
+    if params.get("output") == "json":
+        def stream_json():
+            yield '{"bank": %s, "saldo_inicial": %s, "lines": [' % (
+                json.dumps(bank_name), json.dumps(saldo_inicial, cls=DjangoJSONEncoder)
+            )
+            for i, line in enumerate(statement_lines()):
+                yield ("," if i else "") + json.dumps(line, cls=DjangoJSONEncoder)
+            yield "]}"
+
+        return StreamingHttpResponse(stream_json(), content_type="application/json")
 
-    # 🔵 5. Gerar PDF
+    # 🔵 4. Gerar PDF
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = "inline; filename=extrato_bancario.pdf"
 
@@ -174,7 +186,9 @@ def generate_bank_statement_report(request):
     y -= 15
     pdf.setFont("Helvetica", 9)
 
-    for line in lines:
+    row_count = 0
+    for line in statement_lines():
+        row_count += 1
         if y < 60:
             pdf.showPage()
             y = height - 50
@@ -210,37 +224,31 @@ def generate_bank_statement_report(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(row_count)
     return response
 
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_chartaccount_summary_report(request):
+@cached_report("extrato_bancario", cross_company=True)
+def generate_bank_statement_report(request):
+    return build_bank_statement_report(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_chartaccount_summary_report(company, params, user):
     from django.utils import timezone
 
-    code = request.query_params.get("code")
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
+    code = params.get("code")
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
 
-    user = request.user
-    company = get_company_or_404(request)
 
     if not code:
         return Response({"error": "chart_account_code is required"}, status=400)
 
-    # 1. Buscar conta base e suas descendentes
+    # 1. Buscar conta base e suas descendentes (prefixo do path indexado)
     root = get_object_or_404(ChartAccount, code=code)
-    accounts = ChartAccount.objects.select_related("parent")
-
-    descendants = []
-
-    def collect_descendants(acc_id):
-        children = [a for a in accounts if a.parent_id == acc_id]
-        for c in children:
-            descendants.append(c.id)
-            collect_descendants(c.id)
-
-    collect_descendants(root.id)
-    all_ids = [root.id] + descendants
+    all_ids = list(root.get_descendants().values_list("id", flat=True))
 
     # 2. Filtrar pagamentos alocados a essas contas
     payments = Payment.objects.filter(company=company).order_by("date")
@@ -249,30 +257,32 @@ def generate_chartaccount_summary_report(request):
     if date_max:
         payments = payments.filter(date__lte=date_max)
 
-    payments = payments.select_related("bill__person", "income__person").prefetch_related("bill__allocations", "income__allocations")
-    results = []
-
-    for p in payments:
-        accrual = p.payable
-        if not accrual:
-            continue
+    payments = list(payments.select_related("bill__person", "income__person"))
 
-        allocations = accrual.allocations.filter(chart_account_id__in=all_ids)
-        for allocation in allocations:
-            ratio = allocation.value / accrual.value if accrual.value else 0
-            paid_value = round(p.value * ratio, 2)
+    # 3. Rateio de cada pagamento pelas alocações dessas contas, de uma vez só
+    frame = payment_frame(payments)
+    allocations = allocation_frame(
+        AccountAllocation.objects.filter(
+            chart_account_id__in=all_ids, accrual_id__in=frame["accrual_id"].unique().tolist()
+        )
+    )
+    splits = split_payments(frame, allocations)
 
-            results.append({
-                "id": p.id,
-                "date": p.date,
-                "type": "Despesa" if p.bill else "Receita",
-                "person": accrual.person.name if accrual.person else "-",
-                "description": accrual.description,
-                "doc_number": p.doc_number or "DN",
-                "value": paid_value,
-            })
+    results = []
+    for position, paid_value in splits[["position", "split"]].itertuples(index=False):
+        p = payments[position]
+        accrual = p.payable
+        results.append({
+            "id": p.id,
+            "date": p.date,
+            "type": "Despesa" if p.bill else "Receita",
+            "person": accrual.person.name if accrual.person else "-",
+            "description": accrual.description,
+            "doc_number": p.doc_number or "DN",
+            "value": from_cents(paid_value),
+        })
 
-    # 3. Gerar PDF
+    # 4. Gerar PDF
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = f"inline; filename=relatorio_resumo_plano_{code}.pdf"
 
@@ -344,18 +354,21 @@ def generate_chartaccount_summary_report(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(len(results))
     return response
 
 
-
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_chart_account_balance(request):
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    user = request.user
+@cached_report("plano_contas_resumo")
+def generate_chartaccount_summary_report(request):
+    return build_chartaccount_summary_report(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_chart_account_balance(company, params, user):
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
 
-    company = get_company_or_404(request)
     payments = Payment.objects.filter(company=company)
 
     if date_min:
@@ -363,44 +376,12 @@ def generate_chart_account_balance(request):
     if date_max:
         payments = payments.filter(date__lte=date_max)
 
-    payments = payments.filter(Q(bill__isnull=False) | Q(income__isnull=False))
-
-    chartaccount_totals = defaultdict(Decimal)
-    receitas_payments = []
-
-    for payment in payments:
-        accrual = payment.payable
-        if not accrual:
-            continue
-
-        original_value = accrual.value or Decimal("0.00")
-        if original_value == 0:
-            continue
-
-        payment_ratio = payment.value / original_value
+    # Totais por conta calculados no banco (uma query agrupada por lado bill/income)
+    chartaccount_totals = chart_account_totals(payments)
 
-        for allocation in accrual.allocations.all():
-            proportional_paid = allocation.value * payment_ratio
-            chartaccount_totals[allocation.chart_account_id] += proportional_paid
-
-    chart_accounts = ChartAccount.objects.all().select_related("parent")
+    chart_accounts = list(ChartAccount.objects.all())
     account_map = {acc.id: acc for acc in chart_accounts}
-    parent_children = defaultdict(list)
-    for acc in chart_accounts:
-        if acc.parent_id:
-            parent_children[acc.parent_id].append(acc.id)
-
-    totals_with_children = {}
-    def sum_children(account_id):
-        total = chartaccount_totals.get(account_id, Decimal("0.00"))
-        for child_id in parent_children.get(account_id, []):
-            total += sum_children(child_id)
-        totals_with_children[account_id] = total
-        return total
-
-    for acc_id in account_map:
-        if account_map[acc_id].parent_id is None:
-            sum_children(acc_id)
+    totals_with_children, parent_children = rollup_chart_accounts(chartaccount_totals, chart_accounts)
 
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = "inline; filename=relatorio_completo_contas.pdf"
@@ -484,24 +465,29 @@ def generate_chart_account_balance(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(sum(1 for total in totals_with_children.values() if total))
     return response
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_cost_center_consolidated_report(request):
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    status = request.query_params.get("status", "todos")
-    type_filter = request.query_params.get("type")
+@cached_report("plano_contas")
+def generate_chart_account_balance(request):
+    return build_chart_account_balance(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_cost_center_consolidated_report(company, params, user):
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
+    status = params.get("status", "todos")
+    type_filter = params.get("type")
+    by_month = params.get("by_month") in ("1", "true")
 
     if type_filter not in ["bills", "incomes"]:
         return Response({"error": "É necessário especificar 'type=bills' ou 'type=incomes'."}, status=400)
 
-    user = request.user
 
     # Filtrar pagamentos
-    company = get_company_or_404(request)
     payments = Payment.objects.filter(company=company)
 
 
@@ -510,34 +496,9 @@ def generate_cost_center_consolidated_report(request):
     if date_max:
         payments = payments.filter(date__lte=date_max)
 
-    if type_filter == "bills":
-        payments = payments.filter(bill__isnull=False)
-    else:
-        payments = payments.filter(income__isnull=False)
-
-    # Preparar o total consolidado
-    cost_center_totals = defaultdict(lambda: Decimal("0.00"))
-
-    for payment in payments:
-        accrual = payment.payable  # Bill ou Income
-        if not accrual:
-            continue
-
-        # Pega o centro de custo
-        label = accrual.cost_center.name if accrual.cost_center else "#Sem Centro"
-
-        # Decide quanto somar
-        if status == "pago":
-            if accrual.status in ["pago", "parcial"]:
-                cost_center_totals[label] += payment.value
-        elif status == "em_aberto":
-            if accrual.status in ["em aberto", "parcial"]:
-                cost_center_totals[label] += payment.value
-        else:  # todos
-            cost_center_totals[label] += payment.value
-
-    # Ordenar por valor decrescente
-    sorted_totals = sorted(cost_center_totals.items(), key=lambda x: x[1], reverse=True)
+    # Total por centro de custo (e por mês, se pedido) numa consulta agrupada
+    side = "bill" if type_filter == "bills" else "income"
+    sorted_totals = cost_center_totals(payments, side, status, by_month=by_month)
 
     # PDF
     response = HttpResponse(content_type="application/pdf")
@@ -579,7 +540,27 @@ def generate_cost_center_consolidated_report(request):
     total_geral = Decimal("0.00")
     pdf.setFont("Helvetica", 9)
 
-    for idx, (cost_center_name, total) in enumerate(sorted_totals):
+    def check_page_break(y, needed=0):
+        # Nova página quando o que vem a seguir (needed) não cabe acima da margem de baixo
+        if y - needed < 60:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 9)
+            return height - 50
+        return y
+
+    month = None
+    for idx, row in enumerate(sorted_totals):
+        cost_center_name, total = row["label"], row["total"]
+
+        if by_month and row["month"] != month:
+            month = row["month"]
+            # O cabeçalho do mês vai para a próxima página junto com a primeira linha dele
+            y = check_page_break(y, needed=20)
+            pdf.setFont("Helvetica-Bold", 9)
+            pdf.drawString(margin, y, month.strftime("%m/%Y"))
+            pdf.setFont("Helvetica", 9)
+            y -= 20
+
         if idx % 2 == 0:
             pdf.setFillColor(colors.whitesmoke)
             pdf.rect(margin, y - 4, width - 2 * margin, 18, fill=True, stroke=False)
@@ -589,11 +570,7 @@ def generate_cost_center_consolidated_report(request):
         pdf.drawRightString(width - margin, y, f"R$ {total:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
         total_geral += total
         y -= 20
-
-        if y < 60:
-            pdf.showPage()
-            y = height - 50
-            pdf.setFont("Helvetica", 9)
+        y = check_page_break(y)
 
     # Linha Total
     pdf.setFont("Helvetica-Bold", 10)
@@ -606,24 +583,31 @@ def generate_cost_center_consolidated_report(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(len(sorted_totals))
     return response
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_payments_report(request):
-    type_filter = request.query_params.get("type", "both")
-    status = request.query_params.get("status")
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    person_id = request.query_params.get("person")
-    event_id = request.query_params.get("event_id")
-    cost_center_id = request.query_params.get("cost_center")
-    company_id = request.query_params.get("company_id")
-    if company_id:
-        companies = Company.objects.filter(id=company_id)
-    else:
-        companies = Company.objects.all()
+@cached_report("centro_custo")
+def generate_cost_center_consolidated_report(request):
+    return build_cost_center_consolidated_report(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_payments_report(company, params, user):
+    type_filter = params.get("type", "both")
+    status = params.get("status")
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
+    person_id = params.get("person")
+    event_id = params.get("event_id")
+    cost_center_id = params.get("cost_center")
+    # Relatório entre empresas: só as empresas de que o usuário é membro
+    companies = Company.objects.all() if user.is_superuser else Company.objects.filter(members=user)
+    if params.get("company_id"):
+        companies = companies.filter(id=parse_company_id(params.get("company_id")))
+        if not companies.exists():
+            return Response({"error": "Usuário sem acesso a esta empresa."}, status=403)
 
     event = get_object_or_404(Event, id=event_id) if event_id else None
 
@@ -646,34 +630,7 @@ def generate_payments_report(request):
             bill_qs = bill_qs.filter(event_allocations__event_id=event_id).distinct()
             income_qs = income_qs.filter(event_allocations__event_id=event_id).distinct()
 
-        def get_rows(qs):
-            rows = []
-            for item in qs:
-                if event:
-                    allocation = item.event_allocations.filter(event_id=event.id).first()
-                    if not allocation:
-                        continue
-                    original_value = allocation.value
-                    ratio = allocation.value / item.value if item.value else 0
-                    total_paid = sum(p.value for p in item.payments.all()) * ratio
-                else:
-                    original_value = item.value
-                    total_paid = sum(p.value for p in item.payments.all())
-                value = round(original_value - total_paid, 2)
-                if value <= 0:
-                    continue
-                rows.append({
-                    "id": item.id,
-                    "date": item.date_due,
-                    "person": item.person.name if item.person else "-",
-                    "description": item.description,
-                    "doc_number": item.doc_number or "DN",
-                    "value": value,
-                    "expected_date": getattr(item, "expected_date", None),  # 👈 ADICIONE ESTA LINHA
-                })
-            return rows
-
-        return get_rows(bill_qs), get_rows(income_qs)
+        return open_accrual_rows(bill_qs, event_id), open_accrual_rows(income_qs, event_id)
 
     def get_paid_payments():
         payments = Payment.objects.filter(
@@ -698,32 +655,7 @@ def generate_payments_report(request):
                 Q(income__cost_center_id=cost_center_id)
             )
 
-        bills, incomes = [], []
-        for p in payments.select_related('bill', 'income', 'bill__person', 'income__person').prefetch_related('bill__event_allocations', 'income__event_allocations'):
-            accrual = p.payable
-            if event:
-                allocation = accrual.event_allocations.filter(event_id=event.id).first()
-                if allocation:
-                    ratio = allocation.value / accrual.value if accrual.value else 0
-                    adjusted_value = round(p.value * ratio, 2)
-                else:
-                    continue
-            else:
-                adjusted_value = round(p.value, 2)
-            row = {
-                "id": p.id,
-                "date": p.date,
-                "person": accrual.person.name if accrual.person else "-",
-                "description": p.description,
-                "doc_number": p.doc_number or "DN",
-                "value": adjusted_value,
-                "expected_date": getattr(accrual, "expected_date", None),  # 👈 ADICIONE ESTA LINHA
-            }
-            if p.bill:
-                bills.append(row)
-            elif p.income:
-                incomes.append(row)
-        return bills, incomes
+        return paid_payment_rows(payments, event_id)
 
     # --- Data
     bills_open, incomes_open, bills_paid, incomes_received = [], [], [], []
@@ -825,45 +757,109 @@ def generate_payments_report(request):
     pdf.drawString(width - 100, 30, "Página 1 de 1")
     pdf.showPage()
     pdf.save()
+    response["X-Report-Rows"] = str(len(bills_open) + len(incomes_open) + len(bills_paid) + len(incomes_received))
     return response
 
 
-class BillViewSet(viewsets.ModelViewSet):   
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cached_report("pagamentos", cross_company=True, per_user=True)
+def generate_payments_report(request):
+    return build_payments_report(request.company, request.query_params, request.user)
+
+
+def accrual_list_queryset(model, company, params):
+    """
+    Bills/Incomes of the company filtered by the list query params, with everything
+    BillSerializer/IncomeSerializer read: the person joined in, event and account allocations
+    prefetched (3 queries per page). BillViewSet/IncomeViewSet and explain_hot_queries use it.
+    """
+    queryset = (
+        model.objects.filter(company=company)
+        .select_related("person")
+        .prefetch_related(
+            Prefetch("event_allocations", queryset=EventAllocation.objects.order_by("id")),
+            Prefetch("allocations", queryset=AccountAllocation.objects.order_by("id")),
+        )
+    )
+
+    # Filters
+    id = params.get("id")
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    status = params.getlist("status")  # ["pago", "vencido", "em aberto"]
+    description = params.get("description")
+    person_name = params.get("person")
+    doc_number = params.get("doc_number")
+
+    # Apply filters dynamically
+    if id:
+        queryset = queryset.filter(id=id)
+    if start_date:
+        queryset = queryset.filter(date_due__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date_due__lte=end_date)
+    if status:
+        queryset = queryset.filter(status__in=status)
+    if description:
+        queryset = queryset.filter(description__icontains=description)
+    if person_name:
+        queryset = queryset.filter(person__name__icontains=person_name)
+    if doc_number:
+        queryset = queryset.filter(doc_number=doc_number)
+
+    return queryset.order_by("date_due", "id")
+
+
+class AccrualBulkCreateMixin:
+    """
+    POST <accruals>/bulk/ with a list of Bills/Incomes (nested allocations included).
+
+    Every item is validated first; the valid ones are written with batched INSERTs and the
+    response maps each input index to its created id or its errors.
+    """
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        company = get_company_or_404(request)
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"detail": "Envie uma lista de contas."}, status=400)
+
+        results, valid = [], []
+        for index, item in enumerate(request.data):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+                results.append({"index": index})
+            else:
+                results.append({"index": index, "errors": serializer.errors})
+
+        created = bulk_create_accruals(
+            self.get_serializer_class().Meta.model,
+            [data for _, data in valid],
+            user=request.user,
+            company=company,
+        )
+        for (index, _), accrual in zip(valid, created):
+            results[index]["id"] = accrual.id
+
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(created) < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({"created": len(created), "results": results}, status=response_status)
+
+
+class BillViewSet(AccrualBulkCreateMixin, viewsets.ModelViewSet):   
     serializer_class = BillSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         company = get_company_or_404(self.request)
-        queryset = Bill.objects.filter(company=company)
-        params = self.request.query_params
-
-        # Filters
-        id = params.get("id")
-        start_date = params.get("start_date")
-        end_date = params.get("end_date")
-        status = params.getlist("status")  # ["pago", "vencido", "em aberto"]
-        description = params.get("description")
-        person_name = params.get("person")
-        doc_number = params.get("doc_number")
-        
-        # Apply filters dynamically
-        if id:
-            queryset = queryset.filter(id=id)
-        if start_date:
-            queryset = queryset.filter(date_due__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date_due__lte=end_date)
-        if status:
-            queryset = queryset.filter(status__in=status)
-        if description:
-            queryset = queryset.filter(description__icontains=description)
-        if person_name:
-            queryset = queryset.filter(person__name__icontains=person_name)
-        if doc_number:
-            queryset = queryset.filter(doc_number=doc_number)
-        
-        return queryset.order_by("date_due")
+        return accrual_list_queryset(Bill, company, self.request.query_params)
 
     def perform_create(self, serializer):
         company = get_company_or_404(self.request)
@@ -873,42 +869,14 @@ class BillViewSet(viewsets.ModelViewSet):
         company = get_company_or_404(self.request)
         serializer.save(user=self.request.user, company=company)
 
-class IncomeViewSet(viewsets.ModelViewSet):
+class IncomeViewSet(AccrualBulkCreateMixin, viewsets.ModelViewSet):
     serializer_class = IncomeSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
         company = get_company_or_404(self.request)
-        queryset = Income.objects.filter(company=company)
-        params = self.request.query_params
-
-        # Filters
-        id = params.get("id")
-        start_date = params.get("start_date")
-        end_date = params.get("end_date")
-        status = params.getlist("status")  # ["pago", "vencido", "em aberto"]
-        description = params.get("description")
-        person_name = params.get("person")
-        doc_number = params.get("doc_number")
-        
-        # Apply filters dynamically
-        if id:
-            queryset = queryset.filter(id = id)
-        if start_date:
-            queryset = queryset.filter(date_due__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date_due__lte=end_date)
-        if status:
-            queryset = queryset.filter(status__in=status)
-        if description:
-            queryset = queryset.filter(description__icontains=description)
-        if person_name:
-            queryset = queryset.filter(person__name__icontains=person_name)
-        if doc_number:
-            queryset = queryset.filter(doc_number=doc_number)
-        
-        return queryset.order_by("date_due")
+        return accrual_list_queryset(Income, company, self.request.query_params)
 
     def perform_create(self, serializer):
         company = get_company_or_404(self.request)
@@ -918,6 +886,84 @@ class IncomeViewSet(viewsets.ModelViewSet):
         company = get_company_or_404(self.request)
         serializer.save(user=self.request.user, company=company)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        events = list(instance.event_allocations.values_list("event_id", flat=True))
+        instance.delete()
+        refresh_event_settlement(events)
+
+
+def parse_payment_date(value):
+    """The settlement date sent by the client as a date; None when it is not a valid YYYY-MM-DD."""
+    try:
+        return parse_date(str(value))
+    except ValueError:  # formato certo, data inexistente (2025-02-30)
+        return None
+
+
+def payment_list_queryset(company, params, list_view=True):
+    """
+    Payments of the company filtered by the PaymentViewSet query params; the list view
+    shows only paid ones unless ?status= says otherwise. explain_hot_queries uses it too.
+    """
+    qs = Payment.objects.filter(company=company)  # sempre começa assim
+
+    if list_view:
+        status_list = params.getlist("status")
+        if status_list:
+            qs = qs.filter(status__in=status_list)
+        else:
+            qs = qs.filter(status="pago")
+
+    # Filters
+    start_date = params.get("startDate")
+    end_date = params.get("endDate")
+    min_value = params.get("minValue")
+    max_value = params.get("maxValue")
+    bank_name = params.getlist("bank_name")
+    person = params.get("person")
+    type_filter = params.getlist("type")
+    bill_id = params.get("bill_id")
+    income_id = params.get("income_id")
+    id = params.get("id")
+
+    if id:
+        qs = qs.filter(id = id)
+    if start_date:
+        qs = qs.filter(date__gte=start_date)
+    if end_date:
+        qs = qs.filter(date__lte=end_date)
+    if min_value:
+        qs = qs.filter(value__gte=min_value)
+    if max_value:
+        qs = qs.filter(value__lte=max_value)
+    if bank_name:
+        qs = qs.filter(bank__name__in=bank_name)
+
+    if person:
+        qs = qs.filter(
+            Q(bill__person__name__icontains=person) |
+            Q(income__person__name__icontains=person)
+        )
+
+    if type_filter:
+        conditions = []
+        for t in type_filter:
+            if t.lower() == "despesa":
+                conditions.append(Q(bill__isnull=False))
+            elif t.lower() == "receita":
+                conditions.append(Q(income__isnull=False))
+        if conditions:
+            qs = qs.filter(reduce(lambda x, y: x | y, conditions))
+
+    if bill_id:
+        qs = qs.filter(bill_id=bill_id)
+    if income_id:
+        qs = qs.filter(income_id=income_id)
+
+    return qs.order_by("-date", "-id")
+
+
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
@@ -926,64 +972,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         company = get_company_or_404(self.request)
-        params = self.request.query_params
-
-        qs = Payment.objects.filter(company=company)  # sempre começa assim
-
-        if self.action == "list":
-            status_list = params.getlist("status")
-            if status_list:
-                qs = qs.filter(status__in=status_list)
-            else:
-                qs = qs.filter(status="pago")
-
-        # Filters
-        start_date = params.get("startDate")
-        end_date = params.get("endDate")
-        min_value = params.get("minValue")
-        max_value = params.get("maxValue")
-        bank_name = params.getlist("bank_name")
-        person = params.get("person")
-        type_filter = params.getlist("type")
-        bill_id = params.get("bill_id")
-        income_id = params.get("income_id")
-        id = params.get("id")
-
-        if id:
-            qs = qs.filter(id = id)
-        if start_date:
-            qs = qs.filter(date__gte=start_date)
-        if end_date:
-            qs = qs.filter(date__lte=end_date)
-        if min_value:
-            qs = qs.filter(value__gte=min_value)
-        if max_value:
-            qs = qs.filter(value__lte=max_value)
-        if bank_name:
-            qs = qs.filter(bank__name__in=bank_name)
-
-        if person:
-            qs = qs.filter(
-                Q(bill__person__name__icontains=person) |
-                Q(income__person__name__icontains=person)
-            )
-
-        if type_filter:
-            conditions = []
-            for t in type_filter:
-                if t.lower() == "despesa":
-                    conditions.append(Q(bill__isnull=False))
-                elif t.lower() == "receita":
-                    conditions.append(Q(income__isnull=False))
-            if conditions:
-                qs = qs.filter(reduce(lambda x, y: x | y, conditions))
-
-        if bill_id:
-            qs = qs.filter(bill_id=bill_id)
-        if income_id:
-            qs = qs.filter(income_id=income_id)
-
-        return qs.order_by("-date")
+        return payment_list_queryset(company, self.request.query_params, list_view=self.action == "list")
 
     @transaction.atomic
     def perform_create(self, serializer):
@@ -1000,39 +989,19 @@ class PaymentViewSet(viewsets.ModelViewSet):
             payment.description = parent.description
             payment.save(update_fields=["description"])
 
+        add_payment_totals(payment)
+
         # Se o pagamento está apenas agendado, não atualiza saldo nem status
         if payment.status == "agendado":
             parent.status = "agendado"
             parent.save()
             return
 
-        # Get all existing payments efetivados
-        if payment.bill:
-            existing_payments = Payment.objects.filter(bill=payment.bill, company=company, status="pago")
-        elif payment.income:
-            existing_payments = Payment.objects.filter(income=payment.income, company=company, status="pago")
-
-        total_paid = sum(safe_decimal(p.value) for p in existing_payments)
-        parent_value = safe_decimal(parent.value)
-
-        if parent_value == 0:
-            parent.status = "pago"
-        elif abs(total_paid - parent_value) < Decimal("0.01"):
-            parent.status = "pago"
-        elif total_paid > 0:
-            parent.status = "parcial"
-        else:
-            parent.status = "em aberto"
-
-        parent.save()
+        recompute_statuses([parent.pk])
 
         # Update bank balance
-        if payment.bank:
-            if payment.bill:
-                payment.bank.balance -= payment.value
-            elif payment.income:
-                payment.bank.balance += payment.value
-            payment.bank.save()
+        if payment.bank_id:
+            apply_payment(payment)
 
     @transaction.atomic
     def perform_update(self, serializer):
@@ -1061,75 +1030,31 @@ class PaymentViewSet(viewsets.ModelViewSet):
             payment.description = parent.description
             payment.save(update_fields=["description"])
 
-        # Atualiza status da conta vinculada com base nos pagamentos pagos
-        if payment.bill:
-            existing_payments = Payment.objects.filter(
-                bill=payment.bill, company=company, status="pago"
-            )
-        elif payment.income:
-            existing_payments = Payment.objects.filter(
-                income=payment.income, company=company, status="pago"
-            )
-
-        total_paid = sum(safe_decimal(p.value) for p in existing_payments)
-        parent_value = safe_decimal(parent.value)
-
-        if parent_value == 0:
-            parent.status = "pago"
-        elif abs(total_paid - parent_value) < Decimal("0.01"):
-            parent.status = "pago"
-        elif total_paid > 0:
-            parent.status = "parcial"
-        else:
-            parent.status = "em aberto"
-
-        parent.save()
+        # Atualiza os totais e o status da conta vinculada (e da antiga, se mudou)
+        add_payment_totals(old_instance, sign=-1)
+        add_payment_totals(payment)
+        recompute_statuses([parent.pk, old_bill_id or old_income_id])
 
         # ✅ Só atualiza saldo se status anterior ou novo for 'pago'
         if old_status != "pago" and payment.status != "pago":
             return
 
-        new_bank = payment.bank
-        new_bank_id = new_bank.id if new_bank else None
-        new_bill_id = payment.bill.id if payment.bill else None
-        new_income_id = payment.income.id if payment.income else None
-
-        value_diff = payment.value - old_value
-
-        # ✅ Aplica só a diferença quando tudo se manteve
-        if (
-            old_status == "pago"
-            and payment.status == "pago"
-            and old_bank_id == new_bank_id
-            and old_bill_id == new_bill_id
-            and old_income_id == new_income_id
+        # 📒 Livro de movimentos: estorna a versão antiga e lança a nova (se algo mudou)
+        if (old_status, old_bank_id, old_value, str(old_instance.date), old_bill_id, old_income_id) != (
+            payment.status, payment.bank_id, payment.value, str(payment.date), payment.bill_id, payment.income_id
         ):
-            if new_bank:
-                if payment.bill:
-                    new_bank.balance -= value_diff
-                elif payment.income:
-                    new_bank.balance += value_diff
-                new_bank.save()
-
-        # 🔁 Caso mais complexo: estorna antigo e aplica novo
-        else:
-            # Estorna antigo
-            if old_status == "pago" and old_bank:
-                if old_bill:
-                    old_bank.balance += old_value
-                elif old_income:
-                    old_bank.balance -= old_value
-                old_bank.save()
-
-            # Aplica novo
-            if payment.status == "pago" and new_bank:
-                if payment.bill:
-                    new_bank.balance -= payment.value
-                elif payment.income:
-                    new_bank.balance += payment.value
-                new_bank.save()
-
-
+            if old_status == "pago":
+                record_payment_movement(old_instance, reverse=True)
+            if payment.status == "pago":
+                record_payment_movement(payment)
+
+        # 🏦 Saldo: tira a versão antiga e põe a nova (na mesma conta vira só a diferença)
+        deltas = defaultdict(Decimal)
+        if old_status == "pago" and old_bank_id:
+            deltas[old_bank_id] -= payment_signed_value(old_instance)
+        if payment.status == "pago" and payment.bank_id:
+            deltas[payment.bank_id] += payment_signed_value(payment)
+        shift_balances(deltas)
 
     @transaction.atomic
     def destroy(self, request, *args, **kwargs):
@@ -1149,85 +1074,103 @@ class PaymentViewSet(viewsets.ModelViewSet):
         date = request.data.get("date")
         if not date:
             return Response({"detail": "Campo 'date' é obrigatório."}, status=400)
+        date = parse_payment_date(date)
+        if not date:
+            return Response({"detail": "Data inválida, use AAAA-MM-DD."}, status=400)
 
-        # Atualiza status e data
+        # Atualiza status e data (o valor sai de agendado e entra em pago)
+        add_payment_totals(payment, sign=-1)
         payment.status = "pago"
         payment.date = date
         payment.save(update_fields=["status", "date"])
+        add_payment_totals(payment)
 
         # Atualiza saldo do banco
-        if payment.bank:
-            if payment.bill:
-                payment.bank.balance -= payment.value
-            elif payment.income:
-                payment.bank.balance += payment.value
-            payment.bank.save()
+        if payment.bank_id:
+            apply_payment(payment)
 
         # Atualiza status da conta vinculada
         parent = payment.bill or payment.income
         if parent:
-            if payment.bill:
-                pagamentos = Payment.objects.filter(bill=payment.bill, company=company, status="pago")
-            else:
-                pagamentos = Payment.objects.filter(income=payment.income, company=company, status="pago")
-
-            total_pago = sum(p.value for p in pagamentos)
-            if parent.value == 0:
-                parent.status = "pago"
-            elif abs(total_pago - parent.value) < Decimal("0.01"):
-                parent.status = "pago"
-            elif total_pago > 0:
-                parent.status = "parcial"
-            else:
-                parent.status = "em aberto"
-            parent.save()
+            recompute_statuses([parent.pk])
 
         return Response({"detail": "Pagamento marcado como pago com sucesso."}, status=drf_status.HTTP_200_OK)
 
+    @action(detail=False, methods=["post"], url_path="marcar-pago-lote")
+    @transaction.atomic
+    def marcar_como_pago_lote(self, request):
+        """Settles many scheduled payments on the same date in one transaction."""
+        company = get_company_or_404(request)
+        ids = request.data.get("ids")
+        date = request.data.get("date")
+
+        if not date:
+            return Response({"detail": "Campo 'date' é obrigatório."}, status=400)
+        date = parse_payment_date(date)
+        if not date:
+            return Response({"detail": "Data inválida, use AAAA-MM-DD."}, status=400)
+        try:
+            ids = [int(payment_id) for payment_id in ids]
+        except (TypeError, ValueError):
+            ids = None
+        if not ids:
+            return Response({"detail": "Campo 'ids' deve ser uma lista de pagamentos."}, status=400)
+
+        # Trava as linhas para dois lotes simultâneos não pagarem o mesmo pagamento duas vezes
+        payments = {
+            p.id: p for p in Payment.objects.select_for_update().filter(company=company, id__in=ids)
+        }
+
+        results = []
+        to_settle = []
+        for payment_id in ids:
+            payment = payments.get(payment_id)
+            if not payment:
+                results.append({"id": payment_id, "status": "erro", "detail": "Pagamento não encontrado."})
+            elif payment.status == "pago":
+                results.append({"id": payment_id, "status": "erro", "detail": "Este pagamento já está marcado como pago."})
+            elif payment in to_settle:
+                results.append({"id": payment_id, "status": "erro", "detail": "Pagamento repetido no lote."})
+            else:
+                to_settle.append(payment)
+                results.append({"id": payment_id, "status": "pago"})
+
+        if to_settle:
+            Payment.objects.filter(id__in=[p.id for p in to_settle]).update(status="pago", date=date)
+            for payment in to_settle:
+                payment.status = "pago"
+                payment.date = date
+
+            # Um delta por banco, um INSERT no livro e uma passada nos status das contas
+            deltas = defaultdict(Decimal)
+            for payment in to_settle:
+                if payment.bank_id:
+                    deltas[payment.bank_id] += payment_signed_value(payment)
+            shift_balances(deltas)
+            record_payment_movements(to_settle)
+            recompute_statuses({p.bill_id or p.income_id for p in to_settle}, refresh_totals=True)
+
+        return Response({
+            "detail": f"{len(to_settle)} pagamento(s) marcado(s) como pago(s).",
+            "settled": len(to_settle),
+            "results": results,
+        }, status=drf_status.HTTP_200_OK)
+
 
 @receiver(pre_delete, sender=Payment)
 def handle_payment_deletion(sender, instance, **kwargs):
-    company = instance.company
     parent = instance.bill or instance.income
 
     if not parent:
         raise ValidationError("Pagamento inválido: objeto relacionado não encontrado.")
 
     # 🔁 Estorna o valor no saldo do banco se já estava efetivado
-    if instance.status == "pago" and instance.bank:
-        if instance.bill:
-            instance.bank.balance += instance.value
-        elif instance.income:
-            instance.bank.balance -= instance.value
-        instance.bank.save()
-
-    # 🔄 Atualiza o status da conta (baseado nos pagamentos efetivados restantes)
-    if instance.bill:
-        remaining_payments = Payment.objects.filter(
-            bill=instance.bill,
-            company=company,
-            status="pago"
-        ).exclude(id=instance.id)
-    else:
-        remaining_payments = Payment.objects.filter(
-            income=instance.income,
-            company=company,
-            status="pago"
-        ).exclude(id=instance.id)
-
-    total_paid = sum(safe_decimal(p.value) for p in remaining_payments)
-    parent_value = safe_decimal(parent.value)
-
-    if parent_value == 0:
-        parent.status = "pago"
-    elif abs(total_paid - parent_value) < Decimal("0.01"):
-        parent.status = "pago"
-    elif total_paid > 0:
-        parent.status = "parcial"
-    else:
-        parent.status = "em aberto"
+    if instance.status == "pago" and instance.bank_id:
+        apply_payment(instance, reverse=True)
 
-    parent.save()
+    # 🔄 Atualiza os totais e o status da conta (baseado nos pagamentos efetivados restantes)
+    add_payment_totals(instance, sign=-1)
+    recompute_statuses([parent.pk])
 
 
 class BankViewSet(viewsets.ModelViewSet):
@@ -1238,7 +1181,26 @@ class BankViewSet(viewsets.ModelViewSet):
         return Bank.objects.all()
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # O saldo inicial entra no livro pelo post_save de Bank (payments.ledger)
+        serializer.save(user=self.request.user, company=get_company_or_404(self.request))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        bank = serializer.instance
+        data = serializer.validated_data
+
+        # O saldo nunca vai no save: pagamentos concorrentes o movem com shift_balances e um
+        # valor lido antes deles os apagaria. Saldo editado manualmente vira um delta + ajuste no livro
+        delta = data.pop("balance") - bank.balance if "balance" in data else Decimal("0.00")
+        for field, value in data.items():
+            setattr(bank, field, value)
+        if data:
+            bank.save(update_fields=list(data))
+
+        if delta:
+            shift_balances({bank.id: delta})
+            record_movement(bank.id, delta, timezone.localdate(), kind="ajuste")
+        bank.refresh_from_db(fields=["balance"])
 
 class CostCenterViewSet(viewsets.ModelViewSet):
     serializer_class = CostCenterSerializer
@@ -1259,15 +1221,51 @@ class ChartAccountViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['code', 'description']
 
     def get_queryset(self):
-        queryset = ChartAccount.objects.all()
+        # child_count also tells list() which subtrees the served rows don't hold whole
+        queryset = ChartAccount.objects.annotate(child_count=models.Count('children')).order_by('id')
 
         # Optional filter: only accounts with no children
         leaf_only = self.request.query_params.get('leaf_only')
         if leaf_only == 'true':
-            queryset = queryset.annotate(child_count=models.Count('children')).filter(child_count=0)
+            queryset = queryset.filter(child_count=0)
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        accounts = list(page if page is not None else queryset)
+
+        context = self.get_serializer_context()
+        context["children_map"] = self.get_children_map(accounts)
+        serializer = self.get_serializer_class()(accounts, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @staticmethod
+    def get_children_map(accounts):
+        """
+        Children of every account in the subtrees of `accounts`, built from the served rows;
+        only subtrees they don't hold whole (search, pagination) cost one more query.
+        """
+        served = {acc.pk for acc in accounts}
+        served_children = defaultdict(int)
+        for acc in accounts:
+            served_children[acc.parent_id] += 1
+        partial = [acc for acc in accounts if served_children[acc.pk] < acc.child_count]
+
+        tree = list(accounts)
+        if partial:
+            prefixes = reduce(lambda a, b: a | b, (Q(path__startswith=acc.path) for acc in partial))
+            tree += ChartAccount.objects.filter(prefixes).exclude(pk__in=served)
+
+        children_map = defaultdict(list)
+        for acc in sorted(tree, key=lambda acc: acc.pk):
+            if acc.parent_id:
+                children_map[acc.parent_id].append(acc)
+        return children_map
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1276,41 +1274,31 @@ def event_accruals_view(request, event_id):
     start_date = request.query_params.get("start_date")
     end_date = request.query_params.get("end_date")
 
-    event_allocs = EventAllocation.objects.select_related("accrual").filter(event_id=event_id)
-
-    # Group allocations by accrual ID and keep their ratio
-    accrual_ratios = {
-        alloc.accrual.id: (alloc.value / alloc.accrual.value)
-        for alloc in event_allocs if alloc.accrual.value > 0
-    }
-
-    # Get all payments related to those accruals
-    payments = Payment.objects.select_related("bill", "income")
+    # Only payments of accruals allocated to the event
+    accrual_ids = EventAllocation.objects.filter(event_id=event_id).values("accrual_id")
+    payments = Payment.objects.select_related("bill", "income").filter(
+        Q(bill_id__in=accrual_ids) | Q(income_id__in=accrual_ids)
+    )
 
     if start_date:
         payments = payments.filter(date__gte=start_date)
     if end_date:
         payments = payments.filter(date__lte=end_date)
 
+    payments = list(payments)
+    allocated_values = Payment.get_allocated_values_to_events(payments, [event_id])
+
     payments_bills = []
     payments_incomes = []
     total_despesas = 0
     total_receitas = 0
 
     for payment in payments:
-        accrual = None
-
-        if payment.bill:
-            accrual = payment.bill
-        elif payment.income:
-            accrual = payment.income
-
-        if not accrual or accrual.id not in accrual_ratios:
+        accrual = payment.bill or payment.income
+        allocated_value = allocated_values.get((payment.id, event_id))
+        if not accrual or allocated_value is None:
             continue
 
-        ratio = accrual_ratios[accrual.id]
-        allocated_value = round(payment.value * ratio, 2)
-
         if payment.bill:
             total_despesas += allocated_value
             payments_bills.append({
@@ -1404,13 +1392,9 @@ def combined_extract(request):
 
     return Response({"orders": combined})
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def generate_quadro_espelho_report(request):
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    user = request.user
-    company = get_company_or_404(request)
+def build_quadro_espelho_report(company, params, user):
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
 
     payments = Payment.objects.filter(company=company)
     if date_min:
@@ -1426,47 +1410,19 @@ def generate_quadro_espelho_report(request):
 
     total_faturamento_bruto = events.aggregate(total=models.Sum("total_value"))["total"] or Decimal("0.00")
 
-    event_ids = events.values_list("id", flat=True)
-    event_allocations = EventAllocation.objects.filter(event_id__in=event_ids)
+    total_despesas_eventos = EventAllocation.objects.filter(
+        event__in=events, accrual__bill__isnull=False
+    ).aggregate(total=models.Sum("value"))["total"] or Decimal("0.00")
 
-    accrual_ids = event_allocations.values_list("accrual_id", flat=True)
-    bill_ids = set(Bill.objects.filter(pk__in=accrual_ids).values_list("pk", flat=True))
+    # Pagamentos rateados pelas contas, somados por grupo no banco
+    groups = defaultdict(Decimal)
+    for (group, code), total in chart_group_totals(payments).items():
+        groups[group] += total
 
-    total_despesas_eventos = Decimal("0.00")
-    for alloc in event_allocations:
-        if alloc.accrual_id in bill_ids:
-            total_despesas_eventos += alloc.value
-
-    despesas_fixas = Decimal("0.00")
-    pro_labore = Decimal("0.00")
-    investimentos = Decimal("0.00")
-    manutencoes = Decimal("0.00")
-
-    for payment in payments:
-        accrual = payment.payable
-        if not accrual:
-            continue
-        original_value = accrual.value or Decimal("0.00")
-        if original_value == 0:
-            continue
-
-        payment_ratio = payment.value / original_value
-
-        for allocation in accrual.allocations.all():
-            proportional_paid = allocation.value * payment_ratio
-            group = allocation.chart_account.group
-
-            if not group:
-                continue
-
-            if group.lower() == "despesas fixas":
-                despesas_fixas += proportional_paid
-            elif group.lower() == "pró-labore":
-                pro_labore += proportional_paid
-            elif group.lower() == "investimentos":
-                investimentos += proportional_paid
-            elif group.lower() == "manutenções":
-                manutencoes += proportional_paid
+    despesas_fixas = groups["despesas fixas"]
+    pro_labore = groups["pró-labore"]
+    investimentos = groups["investimentos"]
+    manutencoes = groups["manutenções"]
 
     subtotal_despesas1 = despesas_fixas + pro_labore
     subtotal_despesas2 = investimentos + manutencoes
@@ -1532,13 +1488,17 @@ def generate_quadro_espelho_report(request):
 
     return response
 
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_quadro_realizado_report(request):
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
-    user = request.user
-    company = get_company_or_404(request)
+@cached_report("espelho")
+def generate_quadro_espelho_report(request):
+    return build_quadro_espelho_report(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_quadro_realizado_report(company, params, user):
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
 
     payments = Payment.objects.filter(company=company)
     if date_min:
@@ -1546,44 +1506,17 @@ def generate_quadro_realizado_report(request):
     if date_max:
         payments = payments.filter(date__lte=date_max)
 
-    total_recebimento_bruto = Decimal("0.00")
-    total_despesas_eventos = Decimal("0.00")
-    despesas_fixas = Decimal("0.00")
-    pro_labore = Decimal("0.00")
-    investimentos = Decimal("0.00")
-    manutencoes = Decimal("0.00")
-
-    for payment in payments:
-        accrual = payment.payable
-        if not accrual:
-            continue
-        original_value = accrual.value or Decimal("0.00")
-        if original_value == 0:
-            continue
+    # Recebimento bruto pela conta 10101; o resto das contas pelo grupo
+    groups = defaultdict(Decimal)
+    for (group, code), total in chart_group_totals(payments).items():
+        groups[code or group] += total
 
-        payment_ratio = payment.value / original_value
-
-        for allocation in accrual.allocations.all():
-            proportional_paid = allocation.value * payment_ratio
-            account = allocation.chart_account
-
-            # Recebimento Bruto
-            if account.code == "10101":
-                total_recebimento_bruto += proportional_paid
-
-            # Despesas
-            elif account.group:
-                group = account.group.lower()
-                if group == "eventos":
-                    total_despesas_eventos += proportional_paid
-                elif group == "despesas fixas":
-                    despesas_fixas += proportional_paid
-                elif group == "pró-labore":
-                    pro_labore += proportional_paid
-                elif group == "investimentos":
-                    investimentos += proportional_paid
-                elif group == "manutenções":
-                    manutencoes += proportional_paid
+    total_recebimento_bruto = groups["10101"]
+    total_despesas_eventos = groups["eventos"]
+    despesas_fixas = groups["despesas fixas"]
+    pro_labore = groups["pró-labore"]
+    investimentos = groups["investimentos"]
+    manutencoes = groups["manutenções"]
 
     subtotal_despesas1 = despesas_fixas + pro_labore
     subtotal_despesas2 = investimentos + manutencoes
@@ -1649,17 +1582,21 @@ def generate_quadro_realizado_report(request):
 
     return response
 
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_scheduled_payments_report(request):
+@cached_report("realizado")
+def generate_quadro_realizado_report(request):
+    return build_quadro_realizado_report(get_company_or_404(request), request.query_params, request.user)
+
+
+def build_scheduled_payments_report(company, params, user):
     from reportlab.lib.pagesizes import landscape, A4
     from reportlab.pdfgen import canvas
     from events.utils.pdffunctions import draw_header, check_page_break, truncate_text
 
-    user = request.user
-    company = get_company_or_404(request)
-    date_min = request.query_params.get("date_min")
-    date_max = request.query_params.get("date_max")
+    date_min = params.get("date_min")
+    date_max = params.get("date_max")
 
     # 🔎 Filtrar apenas os pagamentos agendados
     payments = Payment.objects.filter(company=company, status="agendado")
@@ -1738,5 +1675,61 @@ def generate_scheduled_payments_report(request):
     pdf.showPage()
     pdf.save()
 
+    response["X-Report-Rows"] = str(len(bills) + len(incomes))
     return response
 
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@cached_report("agendados")
+def generate_scheduled_payments_report(request):
+    return build_scheduled_payments_report(get_company_or_404(request), request.query_params, request.user)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_cache_stats(request):
+    return Response(cache_stats())
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def submit_report_job(request):
+    report = request.data.get("report")
+    if report not in REPORTS:
+        return Response({"error": f"Relatório inválido. Opções: {', '.join(REPORTS)}."}, status=400)
+
+    params = request.data.get("params") or {}
+    if not isinstance(params, dict):
+        return Response({"error": "'params' deve ser um objeto com os filtros do relatório."}, status=400)
+
+    company = get_company_or_404(request)
+    job = ReportJob.objects.create(user=request.user, company=company, report=report, params=params)
+    transaction.on_commit(lambda: run_report_job.delay(str(job.id)))
+
+    return Response(ReportJobSerializer(job).data, status=drf_status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+    return Response(ReportJobSerializer(job).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def download_report_job(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+    if job.status != "concluido":
+        return Response({"detail": "Relatório ainda não está pronto."}, status=409)
+
+    try:
+        file = open(job.file_path, "rb")
+    except FileNotFoundError:
+        raise Http404("Arquivo do relatório não encontrado.")
+
+    extension = job.file_path.rsplit(".", 1)[-1]
+    response = FileResponse(file, content_type=job.content_type)
+    response["Content-Disposition"] = f"inline; filename={job.report}.{extension}"
+    return response